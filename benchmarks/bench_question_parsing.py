@@ -0,0 +1,87 @@
+"""
+Compares the ways of turning a question completion into question dictionaries:
+
+- the original parser, which makes three filter passes per section and raises on any
+  section missing a tag (including the empty section after a trailing ---);
+- the single-pass tolerant text parser;
+- the structured-output (JSON) parser.
+
+Run with: python benchmarks/bench_question_parsing.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'learning_notes_app')))
+os.environ.setdefault('OPENAI_API_KEY', 'unused')
+from question_generator import QuestionGenerator, is_option
+
+NUM_QUESTIONS = 5
+ITERATIONS = 20000
+
+
+def original_parse(text):
+    def extract(lines, tag):
+        return list(filter(lambda x: x.startswith(tag), lines))[0].replace(tag + ": ", "")
+
+    questions = []
+    for section in text.split("---"):
+        lines = section.split("\n")
+        questions.append({
+            "question": extract(lines, "<Question>"),
+            "options": list(filter(is_option, lines)),
+            "answer": extract(lines, "<Answer>"),
+        })
+
+    return questions
+
+
+def make_questions():
+    return [{
+        "question": f"What does concept number {i} describe in the note?",
+        "options": [f"{letter}) Candidate answer {letter} for question {i}" for letter in "ABCD"],
+        "answer": f"C) Candidate answer C for question {i}",
+    } for i in range(NUM_QUESTIONS)]
+
+
+def to_text(questions, trailing_separator=False):
+    sections = [
+        "\n".join([f"<Question>: {q['question']}", "<Options>:", *q["options"], f"<Answer>: {q['answer']}"])
+        for q in questions
+    ]
+    text = "\n\n---\n\n".join(sections)
+
+    return text + "\n---\n" if trailing_separator else text
+
+
+def bench(label, parse, text):
+    try:
+        parse(text)
+    except (IndexError, ValueError) as e:
+        print(f"{label:<44} fails: {type(e).__name__}, whole completion discarded")
+        return
+
+    seconds = timeit.timeit(lambda: parse(text), number=ITERATIONS)
+    print(f"{label:<44} {seconds / ITERATIONS * 1e6:8.2f} us/completion")
+
+
+def main():
+    questions = make_questions()
+    text = to_text(questions)
+    text_with_trailing = to_text(questions, trailing_separator=True)
+    json_text = json.dumps({"questions": questions})
+
+    text_generator = QuestionGenerator(client=object(), output_format="text")
+    json_generator = QuestionGenerator(client=object(), output_format="json")
+
+    print(f"{NUM_QUESTIONS} questions per completion, {ITERATIONS} iterations\n")
+    bench("original three-pass parser", original_parse, text)
+    bench("original three-pass parser, trailing ---", original_parse, text_with_trailing)
+    bench("single-pass text parser", text_generator._parse_questions, text)
+    bench("single-pass text parser, trailing ---", text_generator._parse_questions, text_with_trailing)
+    bench("structured output (JSON) parser", json_generator._parse_questions, json_text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares rendering 100-note timeline pages with large HTML bodies using DRF's JSONRenderer,
+the orjson-based ORJSONRenderer and the MessagePackRenderer, and parsing the same payload
+back with each parser.
+
+Run with: python benchmarks/bench_renderers.py
+"""
+import io
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import django
+from django.conf import settings
+
+settings.configure()
+django.setup()
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from learning_notes_app.renderers import MessagePackParser, MessagePackRenderer, ORJSONParser, ORJSONRenderer
+
+PAGE_SIZE = 100
+PARAGRAPHS_PER_NOTE = 60
+ITERATIONS = 50
+
+
+def make_page():
+    created_at = datetime(2024, 11, 11, 12, 0, tzinfo=timezone.utc)
+    paragraph = (
+        '<p class="note-paragraph" style="margin: 0 0 8px 0">Cursor pagination reads a page straight '
+        'off the index with <b>WHERE (created_at, id) &lt; (…)</b> and never counts the rows.</p>'
+    )
+    results = [{
+        'id': i,
+        'user': 1,
+        'title': f'Timeline note {i}',
+        'content': paragraph * PARAGRAPHS_PER_NOTE,
+        'excerpt': 'Cursor pagination reads a page straight off the index and never counts the rows.',
+        'created_at': (created_at + timedelta(minutes=i)).isoformat().replace('+00:00', 'Z'),
+        'updated_at': (created_at + timedelta(minutes=i)).isoformat().replace('+00:00', 'Z'),
+        'archived': False,
+        'labels': [1, 2, 3],
+        'collection': 7,
+    } for i in range(PAGE_SIZE)]
+
+    return {'next_cursor': 'eyJjcmVhdGVkX2F0IjoiMjAyNC0xMS0xMVQxMjowMDowMCIsImlkIjo5OX0', 'previous_cursor': None,
+            'results': results}
+
+
+def bench(label, renderer, parser, page):
+    body = renderer.render(page)
+    render_seconds = timeit.timeit(lambda: renderer.render(page), number=ITERATIONS) / ITERATIONS
+    parse_seconds = timeit.timeit(lambda: parser.parse(io.BytesIO(body)), number=ITERATIONS) / ITERATIONS
+
+    print(f"{label:<26}{len(body) / 1024:>10.0f} KiB{render_seconds * 1000:>12.2f} ms{parse_seconds * 1000:>12.2f} ms")
+
+
+def main():
+    page = make_page()
+
+    print(f"{PAGE_SIZE} notes per page, {PARAGRAPHS_PER_NOTE} HTML paragraphs per note, {ITERATIONS} iterations\n")
+    print(f"{'':<26}{'size':>14}{'render':>15}{'parse':>15}")
+    bench("DRF JSONRenderer", JSONRenderer(), JSONParser(), page)
+    bench("ORJSONRenderer", ORJSONRenderer(), ORJSONParser(), page)
+    bench("MessagePackRenderer", MessagePackRenderer(), MessagePackParser(), page)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import LearningNote, Label
+from .models import CollectionArchiveJob, LearningNote, Label, QuestionGenerationJob
 
 admin.site.register(LearningNote)
-admin.site.register(Label)
\ No newline at end of file
+admin.site.register(Label)
+admin.site.register(QuestionGenerationJob)
+admin.site.register(CollectionArchiveJob)
@@ -0,0 +1,198 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import Collection, Label, LearningNote
+from .serializers import BulkNoteSerializer
+from .timeline_cache import bump_timeline_version
+
+MAX_OPERATIONS = 500
+
+# Operations that act on existing notes listed in `ids`
+NOTE_SET_OPERATIONS = ('archive', 'unarchive', 'move', 'add_label', 'remove_label')
+OPERATIONS = ('create', 'update') + NOTE_SET_OPERATIONS
+
+
+def _as_ids(value):
+    if not isinstance(value, list) or not value:
+        raise ValueError('ids must be a non-empty list of note ids')
+
+    return [int(item) for item in value]
+
+
+def _as_optional_id(value):
+    return None if value is None else int(value)
+
+
+def parse_operation(operation):
+    """
+    Check the shape of one operation and normalise its ids.
+
+    :raises ValueError: If the operation is malformed.
+    """
+    try:
+        return _parse_operation(operation)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Missing or invalid field: {e}") from e
+
+
+def _parse_operation(operation):
+    if not isinstance(operation, dict):
+        raise ValueError('Each operation must be an object')
+
+    op = operation.get('op')
+    if op not in OPERATIONS:
+        raise ValueError(f"op must be one of {', '.join(OPERATIONS)}")
+
+    parsed = {'op': op}
+
+    if op in ('create', 'update'):
+        serializer = BulkNoteSerializer(data=operation, partial=op == 'update')
+        if not serializer.is_valid():
+            raise ValueError(serializer.errors)
+        parsed['fields'] = serializer.validated_data
+        parsed['labels'] = [int(label_id) for label_id in operation.get('labels') or []]
+        parsed['collection_id'] = _as_optional_id(operation.get('collection_id'))
+        if op == 'update':
+            parsed['id'] = int(operation['id'])
+            parsed['labels'] = None if 'labels' not in operation else parsed['labels']
+            parsed['set_collection'] = 'collection_id' in operation
+    else:
+        parsed['ids'] = _as_ids(operation.get('ids'))
+        if op == 'move':
+            parsed['collection_id'] = _as_optional_id(operation.get('collection_id'))
+        elif op in ('add_label', 'remove_label'):
+            parsed['label_id'] = int(operation['label_id'])
+
+    return parsed
+
+
+def check_ownership(user, operations):
+    """
+    Check, with one query per kind of object for the whole batch, that every note, label and
+    collection the operations refer to belongs to the user.
+
+    :return: A dict mapping operation index to an error message.
+    """
+    note_ids, label_ids, collection_ids = set(), set(), set()
+    for operation in operations:
+        note_ids.update(operation.get('ids') or [])
+        if 'id' in operation:
+            note_ids.add(operation['id'])
+        label_ids.update(operation.get('labels') or [])
+        if operation.get('label_id') is not None:
+            label_ids.add(operation['label_id'])
+        if operation.get('collection_id') is not None:
+            collection_ids.add(operation['collection_id'])
+
+    owned_notes = set(LearningNote.objects.filter(user=user, id__in=note_ids).values_list('id', flat=True))
+    owned_labels = set(Label.objects.filter(created_by=user, id__in=label_ids).values_list('id', flat=True))
+    owned_collections = set(
+        Collection.objects.filter(created_by=user, id__in=collection_ids).values_list('id', flat=True))
+
+    errors = {}
+    for index, operation in enumerate(operations):
+        missing_notes = (set(operation.get('ids') or []) | ({operation['id']} if 'id' in operation else set())) - owned_notes
+        missing_labels = (set(operation.get('labels') or []) |
+                          ({operation['label_id']} if operation.get('label_id') is not None else set())) - owned_labels
+        collection_id = operation.get('collection_id')
+
+        if missing_notes:
+            errors[index] = f"Learning notes not found: {sorted(missing_notes)}"
+        elif missing_labels:
+            errors[index] = f"Invalid labels: {sorted(missing_labels)}"
+        elif collection_id is not None and collection_id not in owned_collections:
+            errors[index] = "Collection not found"
+
+    return errors
+
+
+def _create_notes(user, operations):
+    notes = []
+    for operation in operations:
+        note = LearningNote(user=user, collection_id=operation['collection_id'], **operation['fields'])
+        note.refresh_derived_text()
+        notes.append(note)
+
+    # bulk_create skips save(), which is why the derived text is computed above
+    notes = LearningNote.objects.bulk_create(notes)
+
+    LearningNote.labels.through.objects.bulk_create([
+        LearningNote.labels.through(learningnote_id=note.id, label_id=label_id)
+        for note, operation in zip(notes, operations)
+        for label_id in operation['labels']
+    ], ignore_conflicts=True)
+
+    return [note.id for note in notes]
+
+
+def _update_note(note, operation):
+    update_fields = list(operation['fields']) + ['updated_at']
+    for field, value in operation['fields'].items():
+        setattr(note, field, value)
+    if operation['set_collection']:
+        note.collection_id = operation['collection_id']
+        update_fields.append('collection')
+    note.updated_at = timezone.now()
+    # Only write what this operation changed: the note was loaded before the batch's other
+    # operations ran and its remaining fields may be stale
+    note.save(update_fields=update_fields)
+
+    if operation['labels'] is not None:
+        note.labels.set(operation['labels'])
+
+
+def apply_operations(user, operations):
+    """
+    Apply already validated operations in one transaction.
+
+    Creates are batched into one `bulk_create`, label changes go straight to the labels
+    through table, and archive/move are single `UPDATE ... WHERE id IN` statements, so none
+    of them goes through `save()` or re-fires the search-vector trigger.
+
+    :return: One result dict per operation, in order.
+    """
+    now = timezone.now()
+    notes = LearningNote.objects.filter(user=user)
+    through = LearningNote.labels.through
+    results = [{'index': index, 'op': operation['op'], 'status': 'ok'} for index, operation in enumerate(operations)]
+
+    with transaction.atomic():
+        creates = [(index, operation) for index, operation in enumerate(operations) if operation['op'] == 'create']
+        if creates:
+            created_ids = _create_notes(user, [operation for _, operation in creates])
+            for (index, _), note_id in zip(creates, created_ids):
+                results[index]['id'] = note_id
+
+        updates = {operation['id'] for operation in operations if operation['op'] == 'update'}
+        notes_to_update = notes.in_bulk(updates) if updates else {}
+
+        for index, operation in enumerate(operations):
+            op = operation['op']
+            if op == 'create':
+                continue
+
+            if op == 'update':
+                _update_note(notes_to_update[operation['id']], operation)
+                results[index]['id'] = operation['id']
+                continue
+
+            ids = operation['ids']
+            if op == 'archive':
+                updated = notes.filter(id__in=ids).update(archived=True, updated_at=now)
+            elif op == 'unarchive':
+                updated = notes.filter(id__in=ids).update(archived=False, updated_at=now)
+            elif op == 'move':
+                updated = notes.filter(id__in=ids).update(collection_id=operation['collection_id'], updated_at=now)
+            elif op == 'add_label':
+                through.objects.bulk_create(
+                    [through(learningnote_id=note_id, label_id=operation['label_id']) for note_id in ids],
+                    ignore_conflicts=True)
+                updated = notes.filter(id__in=ids).update(updated_at=now)
+            else:
+                through.objects.filter(learningnote_id__in=ids, label_id=operation['label_id']).delete()
+                updated = notes.filter(id__in=ids).update(updated_at=now)
+
+            results[index]['updated'] = updated
+
+    bump_timeline_version(user.id)
+
+    return results
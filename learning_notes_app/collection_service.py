@@ -0,0 +1,130 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Collection, CollectionArchiveJob
+from .timeline_cache import bump_timeline_version
+
+
+class ArchiveJobConflict(Exception):
+    """
+    The collection already has an archive job running in the other direction.
+    """
+
+
+def get_batch_size():
+    return getattr(settings, 'COLLECTION_ARCHIVE_BATCH_SIZE', 500)
+
+
+def start_archive_job(collection, user, action):
+    """
+    Flag the collection as archived (or not) and queue a job that does the same for its
+    notes, reusing a job for the same action that is already waiting or running.
+
+    Jobs with at most COLLECTION_ARCHIVE_INLINE_LIMIT notes to change are run before
+    returning; larger ones are left to the `process_collection_archive_jobs` worker.
+
+    :raises ArchiveJobConflict: If a job for the opposite action is still active.
+    """
+    archived = action == CollectionArchiveJob.Action.ARCHIVE
+
+    with transaction.atomic():
+        # Lock the collection so concurrent archive and unarchive requests are serialized;
+        # locking its jobs alone misses the case where neither sees an active job yet
+        collection = Collection.objects.select_for_update().get(pk=collection.pk)
+
+        active_job = CollectionArchiveJob.objects.select_for_update().filter(
+            collection=collection,
+            status__in=[CollectionArchiveJob.Status.PENDING, CollectionArchiveJob.Status.RUNNING]
+        ).first()
+
+        if active_job is not None:
+            if active_job.action != action:
+                raise ArchiveJobConflict(f"Collection is being {active_job.action}d")
+            return active_job
+
+        collection.is_archived = archived
+        collection.save(update_fields=['is_archived', 'updated_at'])
+
+        total = collection.collection_notes.filter(archived=not archived).count()
+        job = CollectionArchiveJob(collection=collection, requested_by=user, action=action, total=total)
+
+        # An inline job is created already claimed, so no worker can pick it up as well
+        run_inline = total <= getattr(settings, 'COLLECTION_ARCHIVE_INLINE_LIMIT', 1000)
+        if run_inline:
+            job.status = CollectionArchiveJob.Status.RUNNING
+            job.started_at = timezone.now()
+            job.attempts = 1
+
+        job.save()
+
+    bump_timeline_version(collection.created_by_id)
+
+    if run_inline:
+        run_job(job)
+
+    return job
+
+
+def claim_next_job():
+    """
+    Claim the oldest runnable job with SELECT ... FOR UPDATE SKIP LOCKED, like the question
+    job queue. Running jobs whose lease has expired are claimed again and resume from their
+    `last_note_id`.
+    """
+    now = timezone.now()
+    lease_expired_at = now - timedelta(seconds=getattr(settings, 'COLLECTION_ARCHIVE_LEASE_SECONDS', 300))
+
+    with transaction.atomic():
+        job = CollectionArchiveJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=CollectionArchiveJob.Status.PENDING) |
+            Q(status=CollectionArchiveJob.Status.RUNNING, started_at__lt=lease_expired_at)
+        ).order_by('created_at').first()
+
+        if job is None:
+            return None
+
+        job.status = CollectionArchiveJob.Status.RUNNING
+        job.started_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'started_at', 'attempts'])
+
+    return job
+
+
+def run_job(job):
+    """
+    Archive or unarchive a claimed job's notes one primary-key batch at a time, saving
+    progress and bumping the owner's timeline version after every batch. A failed job goes
+    back to the queue, to resume from its checkpoint, until COLLECTION_ARCHIVE_MAX_ATTEMPTS
+    is reached.
+    """
+    collection = job.collection
+    batch_size = get_batch_size()
+
+    try:
+        while note_ids := collection.archive_notes_batch(job.archived, job.last_note_id, batch_size):
+            job.processed += len(note_ids)
+            job.last_note_id = note_ids[-1]
+            # Renew the lease so a long job is not claimed by a second worker
+            job.started_at = timezone.now()
+            job.save(update_fields=['processed', 'last_note_id', 'started_at'])
+            bump_timeline_version(collection.created_by_id)
+    except Exception as e:
+        job.error = str(e)
+        if job.attempts >= getattr(settings, 'COLLECTION_ARCHIVE_MAX_ATTEMPTS', 3):
+            job.status = CollectionArchiveJob.Status.FAILED
+            job.finished_at = timezone.now()
+        else:
+            job.status = CollectionArchiveJob.Status.PENDING
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        return job
+
+    job.status = CollectionArchiveJob.Status.SUCCEEDED
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+
+    return job
@@ -1,17 +1,26 @@
+from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
-from .models import Collection
+from .etags import etag_matches, not_modified, queryset_etag
+from .collection_service import ArchiveJobConflict, start_archive_job
+from .models import Collection, CollectionArchiveJob
 from .serializers import CollectionSerializer
+from .timeline_cache import bump_timeline_version
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def fetch_user_collections(request, pk):
     collections = Collection.objects.filter(created_by=pk, is_archived=False)
+
+    etag = queryset_etag(request, collections)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     serializer = CollectionSerializer(collections, many=True)
 
-    return Response(serializer.data)
+    return Response(serializer.data, headers={'ETag': etag})
 
 
 @api_view(['POST'])
@@ -22,20 +31,71 @@ def create_collection(request):
 
     if name:
         collection = Collection.objects.create(created_by=user, name=name)
+        bump_timeline_version(user.id)
         serializer = CollectionSerializer(collection)
         return Response(serializer.data)
     else:
         return Response({'error': 'Collection name is required'}, status=400)
 
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def archive_collection(request, collection_id):
+def archive_job_data(job):
+    data = {
+        "job_id": job.id,
+        "collection_id": job.collection_id,
+        "action": job.action,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+    }
+
+    if job.status == CollectionArchiveJob.Status.FAILED:
+        data["error"] = job.error
+
+    return data
+
+
+def start_collection_job(request, collection_id, action):
     try:
         collection = Collection.objects.get(
             id=collection_id, created_by=request.user)
-        collection.archive_collection()
-
-        return Response({"message": "Collection archived successfully"})
     except Collection.DoesNotExist:
         return Response({"error": "Collection not found"}, status=404)
+
+    try:
+        job = start_archive_job(collection, request.user, action)
+    except ArchiveJobConflict as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+    finished = job.status == CollectionArchiveJob.Status.SUCCEEDED
+
+    return Response(archive_job_data(job), status=status.HTTP_200_OK if finished else status.HTTP_202_ACCEPTED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def archive_collection(request, collection_id):
+    """
+    Archive a collection and its notes. Small collections are done before the response
+    (200); large ones answer 202 with a job to poll at `api/collection/archive-jobs/<id>/`.
+    """
+    return start_collection_job(request, collection_id, CollectionArchiveJob.Action.ARCHIVE)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def unarchive_collection(request, collection_id):
+    """
+    Unarchive a collection and its notes; answers like `archive_collection`.
+    """
+    return start_collection_job(request, collection_id, CollectionArchiveJob.Action.UNARCHIVE)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def collection_archive_job_status(request, job_id):
+    try:
+        job = CollectionArchiveJob.objects.get(id=job_id, requested_by=request.user)
+    except CollectionArchiveJob.DoesNotExist:
+        return Response({"error": "Job not found"}, status=404)
+
+    return Response(archive_job_data(job))
@@ -0,0 +1,47 @@
+import hashlib
+import json
+
+from django.db.models import Count, Max
+from django.utils.cache import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(request, *parts):
+    """
+    Builds a strong ETag for the requested URL and negotiated media type from the given state.
+    """
+    media_type = getattr(request, 'accepted_media_type', None)
+    state = json.dumps([request.get_full_path(), media_type, *parts], default=str)
+
+    return quote_etag(hashlib.sha1(state.encode('utf-8')).hexdigest())
+
+
+def queryset_etag(request, queryset, updated_field='updated_at', **aggregates):
+    """
+    Builds an ETag for a scoped set from its latest `updated_field` and row count, computed
+    in one aggregate query. Extra aggregates can cover changes `updated_field` misses.
+    """
+    state = queryset.order_by().aggregate(
+        last_updated=Max(updated_field), count=Count('pk'), **aggregates)
+
+    return make_etag(request, sorted(state.items()))
+
+
+def etag_matches(request, etag):
+    """
+    Evaluates If-None-Match against `etag` using weak comparison, as RFC 9110 requires.
+    """
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+
+    etags = parse_etags(header)
+    if '*' in etags:
+        return True
+
+    return any(candidate.removeprefix('W/') == etag for candidate in etags)
+
+
+def not_modified(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
@@ -1,18 +1,28 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .models import Label
+from .etags import etag_matches, not_modified, queryset_etag
+from .models import Label, LearningNote
 from .serializers import LabelSerializer
+from .timeline_cache import bump_timeline_version
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def label_list(request, pk):
     labels = Label.objects.filter(created_by=pk)
+
+    # Labels are only ever created or deleted, so the highest id stands in for updated_at
+    etag = queryset_etag(request, labels, updated_field='id')
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     serializer = LabelSerializer(labels, many=True)
 
-    return Response(serializer.data)
+    return Response(serializer.data, headers={'ETag': etag})
 
 
 @api_view(['POST'])
@@ -20,7 +30,8 @@ def label_list(request, pk):
 def create_label(request):
     serializer = LabelSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        label = serializer.save()
+        bump_timeline_version(label.created_by_id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -36,6 +47,11 @@ def delete_label(request, label_id):
     if label.created_by != request.user:
         return Response({"error": "You do not have permission to delete this label"}, status=status.HTTP_403_FORBIDDEN)
 
-    label.delete()
+    with transaction.atomic():
+        # The cascade removes the label from its notes without touching them, so bump their
+        # updated_at for the page ETags to change
+        LearningNote.objects.filter(labels=label).update(updated_at=timezone.now())
+        label.delete()
+    bump_timeline_version(label.created_by_id)
 
     return Response({'message': 'Label deleted successfully'}, status=status.HTTP_200_OK)
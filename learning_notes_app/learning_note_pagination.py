@@ -1,17 +1,187 @@
-from rest_framework.pagination import PageNumberPagination
+from datetime import datetime
+
+from django.db import models
+from django.db.models import F, Func, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from .utils import decode_cursor, encode_cursor
+
+
+def row_value(row, field):
+    """
+    Read a field from a page row, which is a model instance or a `values()` dict.
+    """
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+class RowValue(Func):
+    """
+    A row constructor, `(a, b, ...)`. Compared with `<` or `>`, rows are ordered column by
+    column, which Postgres can use as a range bound on a multicolumn index.
+    """
+    template = '(%(expressions)s)'
+    output_field = models.Field()
+
 
 class LearningNotePagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'  # Allow overriding the default page size
     max_page_size = 100
 
-    def get_paginated_response(self, data):
-        return Response({
+    def get_page_state(self):
+        return {
             'count': self.page.paginator.count,
             'total_pages': self.page.paginator.num_pages,
             'current_page': self.page.number,
             'next_page': self.page.next_page_number() if self.page.has_next() else None,
             'previous_page': self.page.previous_page_number() if self.page.has_previous() else None,
+        }
+
+    def get_paginated_response(self, data):
+        return Response({
+            **self.get_page_state(),
             'results': data  # Paginated learning notes
         })
+
+
+class LearningNoteCursorPagination(BasePagination):
+    """
+    Keyset pagination for learning notes ordered by (created_at, id), newest first.
+
+    Pages are fetched with a `WHERE (created_at, id) < (cursor)` predicate instead of
+    an OFFSET, and the total is never counted, so every page costs the same no matter
+    how deep the client has scrolled.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def decode_position(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            position = decode_cursor(token)
+            return {
+                'created_at': datetime.fromisoformat(position['created_at']),
+                'id': int(position['id']),
+                'reverse': bool(position.get('reverse', False)),
+            }
+        except (KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_position(self, note, reverse=False):
+        position = {'created_at': row_value(note, 'created_at').isoformat(), 'id': row_value(note, 'id')}
+        if reverse:
+            position['reverse'] = True
+
+        return encode_cursor(position)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        position = self.decode_position(request)
+        reverse = position is not None and position['reverse']
+
+        if position is None:
+            queryset = queryset.order_by('-created_at', '-id')
+        else:
+            # A single row comparison, unlike the equivalent OR of column comparisons, starts
+            # the index scan right at the cursor
+            queryset = queryset.alias(keyset=RowValue(F('created_at'), F('id')))
+            cursor_row = RowValue(Value(position['created_at']), Value(position['id']))
+
+            if reverse:
+                queryset = queryset.filter(keyset__gt=cursor_row).order_by('created_at', 'id')
+            else:
+                queryset = queryset.filter(keyset__lt=cursor_row).order_by('-created_at', '-id')
+
+        # Fetch one extra row to find out whether there is another page in this direction
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_cursor = self.encode_position(rows[-1]) if rows and has_next else None
+        self.previous_cursor = self.encode_position(rows[0], reverse=True) if rows and has_previous else None
+
+        return rows
+
+    def get_page_state(self):
+        return {
+            'next_cursor': self.next_cursor,
+            'previous_cursor': self.previous_cursor,
+        }
+
+    def get_paginated_response(self, data):
+        return Response({
+            **self.get_page_state(),
+            'results': data
+        })
+
+
+class SearchRankCursorPagination(LearningNoteCursorPagination):
+    """
+    Keyset pagination for search results ordered by (rank, id), best match first.
+
+    Expects the queryset to be annotated with a double precision `rank`, so the value round
+    trips through the cursor exactly and `rank < cursor` never skips or repeats a row.
+    Search screens only load forward, so there is no previous cursor.
+    """
+    page_size = 20
+
+    def decode_position(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            position = decode_cursor(token)
+            return {'rank': float(position['rank']), 'id': int(position['id'])}
+        except (KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_position(self, note, reverse=False):
+        return encode_cursor({'rank': row_value(note, 'rank'), 'id': row_value(note, 'id')})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        position = self.decode_position(request)
+
+        if position is not None:
+            queryset = queryset.filter(
+                Q(rank__lt=position['rank']) |
+                Q(rank=position['rank'], id__lt=position['id'])
+            )
+
+        # Postgres only keeps the best page_size + 1 matches while ranking, not every match
+        rows = list(queryset.order_by('-rank', '-id')[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+
+        self.next_cursor = self.encode_position(rows[-1]) if has_next else None
+        self.previous_cursor = None
+
+        return rows
+
+    def get_page_state(self):
+        return {'next_cursor': self.next_cursor}
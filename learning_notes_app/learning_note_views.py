@@ -1,22 +1,62 @@
 from cmath import isnan
 from django.shortcuts import get_object_or_404
 from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Count, Exists, F, FloatField, OuterRef
+from django.db.models.functions import Cast
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework import status, permissions
-from rest_framework.permissions import IsAuthenticated
-from .models import Collection, LearningNote, Label
-from .serializers import LearningNoteSerializer
-from .learning_note_pagination import LearningNotePagination
-from .question_generator import QuestionGenerator
-from .utils import extract_text_from_html
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from .models import Collection, LearningNote, Label, QuestionGenerationJob
+from .serializers import (
+    LearningNoteRowSerializer, LearningNoteSearchResultSerializer, LearningNoteSerializer, parse_fieldset)
+from .learning_note_pagination import (
+    LearningNotePagination, LearningNoteCursorPagination, SearchRankCursorPagination)
+from .question_generator import QuestionGenerator, llm_circuit_breaker
+from .question_service import (
+    enqueue_question_job, get_question_params, get_cached_questions, lookup_cached_questions,
+    store_cached_questions, store_note_questions)
+from . import bulk_operations
+from .note_export import export_ndjson
+from .note_import import READERS, detect_format, import_notes
+from .renderers import EventStreamRenderer, NDJSONRenderer, ORJSONRenderer, format_sse_event
+from .search_service import add_search_headlines, typeahead_search
+from .etags import etag_matches, make_etag, not_modified, queryset_etag
+from .timeline_cache import bump_timeline_version, timeline_cache
+import io
 import json
 
+
+def filter_notes_by_labels(learning_notes, label_ids):
+    """
+    Keep notes carrying any of the given labels.
+
+    Uses an EXISTS semi-join on the labels through table rather than a join plus
+    `.distinct()`, so Postgres can walk the timeline index in order and stop after one page.
+    """
+    note_labels = LearningNote.labels.through.objects.filter(
+        learningnote_id=OuterRef('pk'), label_id__in=label_ids)
+
+    return learning_notes.filter(Exists(note_labels))
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def fetch_timeline(request, user_id):
     """
     Fetch learning notes by collection and optionally filter by labels with pagination.
+
+    Pass `pagination=cursor` (or a `cursor` returned by a previous page) to use keyset
+    pagination, which skips the total count and stays fast on deep pages.
+
+    Notes carry a short plain-text `excerpt` instead of their `content`. `fields=` or
+    `exclude=` (comma-separated) pick the note fields returned; columns left out are not
+    read from the database at all.
+
+    Responses are cached per user and invalidated by bumping the user's timeline version
+    on every write. The ETag is derived from the ids and `updated_at` of the page's notes,
+    so a matching If-None-Match is answered with 304 before anything is serialized.
     """
     collection_id_str = request.GET.get('collection_id', 0)
     label_ids_str = request.GET.get('labels', None)
@@ -35,6 +75,29 @@ def fetch_timeline(request, user_id):
     else:
         label_ids = []
 
+    try:
+        fields = parse_fieldset(
+            request.GET, LearningNoteRowSerializer.output_fields, LearningNoteRowSerializer.default_fields)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    use_cursor = request.GET.get('pagination') == 'cursor' or 'cursor' in request.GET
+    cache_key = timeline_cache.make_key(user_id, {
+        'collection_id': collection_id,
+        'labels': sorted(set(label_ids)),
+        'pagination': 'cursor' if use_cursor else 'page',
+        'cursor': request.GET.get('cursor') if use_cursor else None,
+        'page': None if use_cursor else request.GET.get('page'),
+        'page_size': request.GET.get('page_size'),
+        'fields': fields,
+        'media_type': request.accepted_media_type,
+    })
+    cached = timeline_cache.get(cache_key)
+    if cached is not None:
+        if etag_matches(request, cached['etag']):
+            return not_modified(cached['etag'])
+        return Response(cached['data'], headers={'ETag': cached['etag'], 'X-Timeline-Cache': 'HIT'})
+
     if collection_id is not None:
         if collection_id == 0:  # Default category that indicates fetching all notes
             learning_notes = LearningNote.objects.filter(
@@ -59,16 +122,39 @@ def fetch_timeline(request, user_id):
             return Response({"error": f"Invalid labels: {list(invalid_label_ids)}"}, status=status.HTTP_400_BAD_REQUEST)
 
         if len(label_ids) > 0:
-            learning_notes = learning_notes.filter(labels__id__in=label_ids).distinct()
+            learning_notes = filter_notes_by_labels(learning_notes, label_ids)
+
+    if use_cursor:
+        paginator = LearningNoteCursorPagination()
+    else:
+        learning_notes = learning_notes.order_by('-created_at')
+        paginator = LearningNotePagination()
+
+    paginated_learning_notes = paginator.paginate_queryset(
+        LearningNoteRowSerializer.values(learning_notes, fields), request)
 
-    learning_notes = learning_notes.order_by('-created_at')
+    etag = make_etag(request, paginator.get_page_state(),
+                     [(note['id'], note['updated_at']) for note in paginated_learning_notes])
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    paginator = LearningNotePagination()
-    paginated_learning_notes = paginator.paginate_queryset(learning_notes, request)
+    serializer = LearningNoteRowSerializer(paginated_learning_notes, fields)
 
-    serializer = LearningNoteSerializer(paginated_learning_notes, many=True)
+    response = paginator.get_paginated_response(serializer.data)
+    timeline_cache.set(cache_key, {'data': response.data, 'etag': etag})
+    response['ETag'] = etag
+    response['X-Timeline-Cache'] = 'MISS'
 
-    return paginator.get_paginated_response(serializer.data)
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def timeline_cache_stats(request):
+    """
+    Hit/miss counters of the timeline cache for the process serving the request.
+    """
+    return Response(timeline_cache.stats())
 
 
 @api_view(['POST'])
@@ -84,6 +170,7 @@ def archive_learning_note(request, pk):
 
     learning_note.archived = True
     learning_note.save()
+    bump_timeline_version(learning_note.user_id)
 
     serializer = LearningNoteSerializer(learning_note)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -112,11 +199,58 @@ def add_learning_note(request, userId):
                 learning_note.collection = collection
                 learning_note.save()
 
+            bump_timeline_version(user.id)
+
             return Response(serializer.data, status=status.HTTP_201_CREATED)
     else:
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_learning_note_operations(request):
+    """
+    Apply a list of note operations in one transaction: `create`, `update`, `archive`,
+    `unarchive`, `move` (to `collection_id`, or out of any collection with null),
+    `add_label` and `remove_label`; the last five take a list of note `ids`.
+
+    Ownership of every referenced note, label and collection is checked up front for the
+    whole batch. If any operation is invalid nothing is applied and the per-item results
+    say which ones failed.
+    """
+    operations = request.data.get('operations')
+
+    if not isinstance(operations, list) or not operations:
+        return Response({'error': 'operations must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(operations) > bulk_operations.MAX_OPERATIONS:
+        return Response({'error': f'At most {bulk_operations.MAX_OPERATIONS} operations per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    parsed = []
+    errors = {}
+    for index, operation in enumerate(operations):
+        try:
+            parsed.append(bulk_operations.parse_operation(operation))
+        except ValueError as e:
+            errors[index] = e.args[0]
+            parsed.append({})
+
+    if not errors:
+        errors = bulk_operations.check_ownership(request.user, parsed)
+
+    if errors:
+        results = [
+            {'index': index, 'op': operation.get('op'), 'status': 'error', 'error': errors[index]}
+            if index in errors else {'index': index, 'op': operation.get('op'), 'status': 'skipped'}
+            for index, operation in enumerate(
+                operation if isinstance(operation, dict) else {} for operation in operations)
+        ]
+        return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'results': bulk_operations.apply_operations(request.user, parsed)})
+
+
 @api_view(['PATCH'])
 @permission_classes([permissions.IsAuthenticated])
 def update_learning_note(request, pk):
@@ -134,6 +268,7 @@ def update_learning_note(request, pk):
         learning_note = serializer.save()
         learning_note_labels = request.data.get('labels')
         learning_note.labels.set(learning_note_labels)
+        bump_timeline_version(learning_note.user_id)
         return Response(serializer.data, status=status.HTTP_200_OK)
     else:
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -151,6 +286,7 @@ def delete_learning_note(request, pk):
         return Response({"error": "You do not have permission to delete this note"}, status=status.HTTP_403_FORBIDDEN)
 
     learning_note.delete()
+    bump_timeline_version(request.user.id)
 
     serializer = LearningNoteSerializer(learning_note)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -167,6 +303,7 @@ def add_label_to_learning_note(request, note_id):
         label = Label.objects.get(id=label_id)
         note.labels.add(label)
         note.save()
+        bump_timeline_version(user.id)
 
     return Response(status=status.HTTP_200_OK)
 
@@ -182,6 +319,7 @@ def remove_label_from_learning_note(request, note_id):
         label = Label.objects.get(id=label_id)
         note.labels.remove(label)
         note.save()
+        bump_timeline_version(user.id)
 
     return Response(status=status.HTTP_200_OK)
 
@@ -198,6 +336,7 @@ def add_note_to_collection(request, note_id):
                 id=collection_id, created_by=request.user)
             note.collection = collection
             note.save()
+            bump_timeline_version(request.user.id)
 
             return Response({"message": "Note added to collection successfully"})
         else:
@@ -206,83 +345,305 @@ def add_note_to_collection(request, note_id):
         return Response({"error": "Collection not found"}, status=404)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([NDJSONRenderer, ORJSONRenderer])
+def export_learning_notes(request):
+    """
+    Stream all of the user's notes, with their labels and collection, as NDJSON (one note
+    per line). Notes are read in chunks through a server-side cursor, so the export never
+    holds more than one chunk in memory.
+    """
+    response = StreamingHttpResponse(export_ndjson(request.user), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="learning-notes-{request.user.id}.ndjson"'
+    response['Cache-Control'] = 'no-store'
+    response['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_learning_notes(request):
+    """
+    Import notes from an uploaded `file`: NDJSON in the export format, or CSV (picked by a
+    `.csv` name or `text/csv` type) with `title`, `content`, `created_at`, `archived`,
+    `collection` and semicolon-separated `labels` columns.
+
+    Collections and labels are matched by name and created when missing. Invalid records
+    are skipped and reported; everything else is loaded in one transaction.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    reader = READERS[detect_format(upload.name, upload.content_type)]
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+
+    try:
+        result = import_notes(request.user, reader(stream))
+    except UnicodeDecodeError:
+        return Response({'error': 'file must be UTF-8 encoded'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(result, status=status.HTTP_201_CREATED if result['imported'] else status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_notes_by_collection(request, collection_id):
+    """
+    All notes of a collection, with an `excerpt` instead of their `content` by default.
+    Accepts the same `fields=` / `exclude=` parameters as the timeline.
+    """
+    try:
+        fields = parse_fieldset(
+            request.GET, LearningNoteRowSerializer.output_fields, LearningNoteRowSerializer.default_fields)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         collection = Collection.objects.get(
             id=collection_id, created_by=request.user)
         notes = LearningNote.objects.filter(
             collection=collection, user=request.user)
-        serializer = LearningNoteSerializer(notes, many=True)
 
-        return Response(serializer.data)
+        etag = queryset_etag(request, notes)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        serializer = LearningNoteRowSerializer(list(LearningNoteRowSerializer.values(notes, fields)), fields)
+
+        return Response(serializer.data, headers={'ETag': etag})
     except Collection.DoesNotExist:
         return Response({"error": "Collection not found"}, status=404)
 
 
+def search_facets(matches, label_ids, collection_id):
+    """
+    Count matching notes per label and per collection. Each facet ignores its own filter, so
+    the client can show how many results picking another label or collection would give.
+    """
+    label_matches = matches
+    if collection_id:
+        label_matches = label_matches.filter(collection_id=collection_id)
+
+    labels = LearningNote.labels.through.objects.filter(
+        learningnote__in=label_matches.values('pk')
+    ).values('label_id', 'label__name').annotate(count=Count('learningnote_id')).order_by('-count', 'label_id')
+
+    collection_matches = matches
+    if label_ids:
+        collection_matches = filter_notes_by_labels(collection_matches, label_ids)
+
+    collections = collection_matches.filter(collection__isnull=False).values(
+        'collection_id', 'collection__name').annotate(count=Count('pk')).order_by('-count', 'collection_id')
+
+    return {
+        'labels': [
+            {'id': row['label_id'], 'name': row['label__name'], 'count': row['count']} for row in labels],
+        'collections': [
+            {'id': row['collection_id'], 'name': row['collection__name'], 'count': row['count']}
+            for row in collections],
+    }
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def search_learning_notes(request):
-    query = request.GET.get('query', '')
-    user_id = request.GET.get('userId')
-
-    if query and user_id:
-        search_query = SearchQuery(query)
-        learning_notes = LearningNote.objects.annotate(
-            rank=SearchRank('search_vector', search_query)
-        ).filter(search_vector=search_query, user=user_id).order_by('-rank')[:10]
-    else:
-        learning_notes = []
+    """
+    Full-text search over the current user's notes, best match first.
 
-    if user_id:
-        serializer = LearningNoteSerializer(learning_notes, many=True)
-        return Response(serializer.data)
-    else:
-        return Response({"error": "UserId is missing"}, status=404)
-
-def generate_new_questions(html_content):
-    plain_text_content = extract_text_from_html(html_content)
-    content_length = len(plain_text_content.split())
-
-    if content_length <= 100:
-        num_questions = 1
-    elif content_length > 100 and content_length <= 200:
-        num_questions = 2
-    elif content_length > 200 and content_length <= 500:
-        num_questions = 4
-    else:
-        num_questions = 5
+    Optional filters: `collection_id`, `labels` (a JSON list of ids; notes carrying any of
+    them match) and `archived` (`false` by default, `true` or `all`). Results are paged with
+    an opaque `cursor` over (rank, id). The first page also carries per-label and
+    per-collection facet counts, so one request fills the whole search screen.
+
+    Each result has a highlighted `headline` snippet in place of its content; pass
+    `include_content=true` to get the full content as well. `fields=` or `exclude=` choose
+    the returned fields explicitly, and only those columns are read.
+    """
+    query = request.GET.get('query', '').strip()
+    archived = request.GET.get('archived', 'false').lower()
 
-    question_generator = QuestionGenerator()
+    try:
+        collection_id = int(request.GET.get('collection_id', 0))
+    except ValueError:
+        return Response({'error': 'Invalid collection_id'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        label_ids = list(map(int, json.loads(request.GET.get('labels') or '[]')))
+    except (TypeError, ValueError):
+        return Response({'error': 'Invalid label ID in labels list'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if archived not in ('false', 'true', 'all'):
+        return Response({'error': "archived must be 'false', 'true' or 'all'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    include_content = request.GET.get('include_content', '').lower() in ('1', 'true')
+    available_fields = LearningNoteSearchResultSerializer.Meta.fields
+    try:
+        fields = parse_fieldset(request.GET, available_fields, default_fields=[
+            field for field in available_fields if include_content or field != 'content'])
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not query:
+        return Response({'next_cursor': None, 'results': [], 'facets': {'labels': [], 'collections': []}})
+
+    search_query = SearchQuery(query)
+    matches = LearningNote.objects.filter(user=request.user, search_vector=search_query)
+    if archived != 'all':
+        matches = matches.filter(archived=archived == 'true')
+
+    learning_notes = matches
+    if collection_id:
+        learning_notes = learning_notes.filter(collection_id=collection_id)
+    if label_ids:
+        learning_notes = filter_notes_by_labels(learning_notes, label_ids)
 
-    questions_data = question_generator.generate_questions(plain_text_content, num_questions)
+    # Rank the stored vector itself: a field name would be re-parsed with to_tsvector for
+    # every match, dropping the title/body weights. The cast keeps the rank exact in cursors.
+    learning_notes = learning_notes.annotate(
+        rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())
+    ).only('id', *[field for field in LearningNoteRowSerializer.fields if field in fields])
+    if 'labels' in fields:
+        learning_notes = learning_notes.prefetch_related('labels')
+
+    paginator = SearchRankCursorPagination()
+    page = paginator.paginate_queryset(learning_notes, request)
+    if 'headline' in fields:
+        page = add_search_headlines(page, search_query)
+    serializer = LearningNoteSearchResultSerializer(page, many=True, fields=fields)
+
+    data = {**paginator.get_page_state(), 'results': serializer.data}
+    if not request.GET.get('cursor'):
+        data['facets'] = search_facets(matches, label_ids, collection_id)
+
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def typeahead_learning_notes(request):
+    """
+    Suggestions for the search box, called on every keystroke. Matches partially typed and
+    misspelt words; see `typeahead_search`.
+    """
+    query = request.GET.get('query', '').strip()
+
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(query) < 2:
+        return Response({'results': []})
+
+    return Response({'results': typeahead_search(request.user, query, limit)})
 
-    return questions_data
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_questions(request):
+    """
+    Return the note's questions if they exist or the same content has been seen before,
+    otherwise queue a generation job and answer 202 with its id. The questions are produced
+    by the `process_question_jobs` worker, so request workers never wait on the LLM.
+    """
     note_id = request.data.get('id')
-    html_content = request.data.get("content", "")
 
     if not note_id:
         return Response({"error": "Note's Id is required"}, status=400)
-    elif not html_content:
-        return Response({"error": "Content is required"}, status=400)
 
-    note = LearningNote.objects.get(id=note_id)
+    try:
+        note = LearningNote.objects.get(id=note_id)
+    except LearningNote.DoesNotExist:
+        return Response({"error": "Learning note not found"}, status=404)
 
-    if note and note.generated_questions:
-        questions_data = note.generated_questions
-    elif note and not note.generated_questions:
-        questions_data = generate_new_questions(html_content)
-        note.generated_questions = questions_data
-        note.save()
-    else:
+    if note.generated_questions:
+        return Response({"questions": note.generated_questions})
+
+    cached_questions = lookup_cached_questions(note)
+    if cached_questions is not None:
+        note.generated_questions = cached_questions
+        note.save(update_fields=['generated_questions'])
+        return Response({"questions": cached_questions})
+
+    job = enqueue_question_job(note, request.user)
+
+    return Response({"job_id": job.id, "status": job.status}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([ORJSONRenderer, EventStreamRenderer])
+def stream_questions(request, note_id):
+    """
+    Stream the note's questions as Server-Sent Events, one `question` event per question as
+    soon as the LLM has finished it, followed by a `done` event. The full set is then stored
+    in the question cache, and on the note unless it was edited meanwhile. Answers 503
+    straight away while the LLM circuit breaker is open.
+    """
+    try:
+        note = LearningNote.objects.get(id=note_id, user=request.user)
+    except LearningNote.DoesNotExist:
         return Response({"error": "Learning note not found"}, status=404)
 
-    if "error" in questions_data:
-        return Response({"error": questions_data["error"]}, status=500)
+    plain_text_content, num_questions = get_question_params(note)
+    questions_data = note.generated_questions or get_cached_questions(
+        plain_text_content, num_questions)
+
+    if not questions_data and llm_circuit_breaker.is_open:
+        return Response({"error": "Question generation is temporarily unavailable"},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def event_stream(questions_data):
+        if questions_data:
+            for question in questions_data:
+                yield format_sse_event('question', question)
+        else:
+            questions_data = []
+            try:
+                for question in QuestionGenerator().stream_questions(plain_text_content, num_questions):
+                    questions_data.append(question)
+                    yield format_sse_event('question', question)
+            except Exception as e:
+                yield format_sse_event('error', {"error": str(e)})
+                return
+
+            if not questions_data:
+                yield format_sse_event('error', {"error": "No questions could be parsed from the completion"})
+                return
+
+            store_cached_questions(plain_text_content, num_questions, questions_data)
+
+        if note.generated_questions != questions_data:
+            # Skipped if the note was edited during the stream
+            store_note_questions(note, plain_text_content, questions_data)
+
+        yield format_sse_event('done', {"count": len(questions_data)})
+
+    response = StreamingHttpResponse(event_stream(questions_data), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def question_job_status(request, job_id):
+    try:
+        job = QuestionGenerationJob.objects.select_related('note').get(
+            id=job_id, requested_by=request.user)
+    except QuestionGenerationJob.DoesNotExist:
+        return Response({"error": "Job not found"}, status=404)
+
+    data = {"job_id": job.id, "status": job.status}
+
+    if job.status == QuestionGenerationJob.Status.SUCCEEDED:
+        data["questions"] = job.note.generated_questions
+    elif job.status == QuestionGenerationJob.Status.FAILED:
+        data["error"] = job.error
 
-    return Response({"questions": questions_data})
+    return Response(data)
@@ -0,0 +1,26 @@
+import json
+import os
+
+
+def read_checkpoint(path):
+    """
+    Return the state saved by `write_checkpoint`, or an empty dict if there is none yet.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+
+    with open(path) as checkpoint_file:
+        return json.load(checkpoint_file)
+
+
+def write_checkpoint(path, state):
+    """
+    Atomically replace the checkpoint so an interrupted run never leaves a partial file.
+    """
+    if not path:
+        return
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as checkpoint_file:
+        json.dump(state, checkpoint_file)
+    os.replace(tmp_path, path)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from learning_notes_app.models import LearningNote
+
+
+class Command(BaseCommand):
+    help = "Compute the text fields derived from note content for rows saved before they existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of notes read and written back per batch.")
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Recompute every note, not only those missing plain text or an excerpt.")
+
+    def handle(self, *args, **options):
+        notes = LearningNote.objects.all()
+        if not options["all"]:
+            notes = notes.filter(Q(plain_text='') | Q(excerpt='')).exclude(content='')
+
+        last_id = 0
+        updated = 0
+        derived_fields = None
+
+        while True:
+            batch = list(notes.filter(id__gt=last_id).order_by('id').only('id', 'content')[:options["batch_size"]])
+            if not batch:
+                break
+
+            for note in batch:
+                derived_fields = note.refresh_derived_text()
+
+            # bulk_update skips save(), so updated_at and generated_questions are left alone
+            LearningNote.objects.bulk_update(batch, derived_fields)
+
+            updated += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Updated {updated} note(s), up to id {last_id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} note(s)"))
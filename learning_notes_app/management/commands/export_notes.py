@@ -0,0 +1,40 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from learning_notes_app.note_export import EXPORT_CHUNK_SIZE, export_ndjson
+
+
+class Command(BaseCommand):
+    help = "Export all notes of a user, with labels and collection, as NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "user",
+            help="Id or email of the user whose notes are exported.")
+        parser.add_argument(
+            "--output",
+            help="File to write to (default: standard output).")
+        parser.add_argument(
+            "--chunk-size", type=int, default=EXPORT_CHUNK_SIZE,
+            help="Number of notes fetched from the database cursor at a time.")
+
+    def handle(self, *args, **options):
+        lookup = {'id': options["user"]} if options["user"].isdigit() else {'email': options["user"]}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found")
+
+        output = open(options["output"], 'wb') if options["output"] else sys.stdout.buffer
+        try:
+            for block in export_ndjson(user, options["chunk_size"]):
+                output.write(block)
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
+
+        if options["output"]:
+            self.stderr.write(self.style.SUCCESS(f"Exported notes of {user.email} to {options['output']}"))
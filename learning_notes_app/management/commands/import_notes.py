@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from learning_notes_app.note_import import IMPORT_BATCH_SIZE, READERS, detect_format, import_notes
+
+
+class Command(BaseCommand):
+    help = "Import notes for a user from an NDJSON (export format) or CSV file, loaded with COPY."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "user",
+            help="Id or email of the user the notes are imported for.")
+        parser.add_argument(
+            "path",
+            help="File to import.")
+        parser.add_argument(
+            "--format", choices=sorted(READERS),
+            help="File format (default: csv for *.csv files, ndjson otherwise).")
+        parser.add_argument(
+            "--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+            help="Number of validated records sent to the staging table per COPY.")
+
+    def handle(self, *args, **options):
+        lookup = {'id': options["user"]} if options["user"].isdigit() else {'email': options["user"]}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found")
+
+        reader = READERS[options["format"] or detect_format(options["path"])]
+
+        try:
+            with open(options["path"], encoding='utf-8-sig', newline='') as stream:
+                result = import_notes(user, reader(stream), options["batch_size"])
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if result['unresolved_labels']:
+            self.stderr.write(
+                "Labels owned by another user were not attached: " + ', '.join(result['unresolved_labels']))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['imported']} notes for {user.email} ({result['invalid']} invalid records skipped)"))
@@ -0,0 +1,133 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from learning_notes_app.management.checkpoint import read_checkpoint, write_checkpoint
+from learning_notes_app.models import LearningNote
+from learning_notes_app.question_generator import LLMUnavailableError, QuestionGenerator
+from learning_notes_app.question_service import (
+    get_cached_questions, get_question_params, hash_content, store_cached_questions)
+from learning_notes_app.timeline_cache import bump_timeline_version
+from learning_notes_app.utils import RateLimiter
+
+
+def get_question_generator():
+    return QuestionGenerator()
+
+
+class Command(BaseCommand):
+    help = "Generate questions for every note that has none, with bounded concurrency and rate limiting."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=4,
+            help="Maximum number of LLM requests in flight.")
+        parser.add_argument(
+            "--rpm", type=int, default=60,
+            help="Maximum number of LLM requests started per minute (0 disables the limit).")
+        parser.add_argument(
+            "--batch-size", type=int, default=50,
+            help="Number of notes fetched and written back per batch.")
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording the last processed note id after every batch.")
+        parser.add_argument(
+            "--resume", action="store_true",
+            help="Continue after the note id recorded in --checkpoint.")
+        parser.add_argument(
+            "--limit", type=int, default=None,
+            help="Stop after this many notes.")
+
+    def handle(self, *args, **options):
+        generator = get_question_generator()
+        rate_limiter = RateLimiter(options["rpm"])
+        checkpoint = options["checkpoint"]
+
+        last_id = read_checkpoint(checkpoint).get("last_id", 0) if options["resume"] else 0
+        processed = generated = failed = 0
+
+        def generate(plain_text_content, num_questions):
+            rate_limiter.acquire()
+            return generator.generate_questions(plain_text_content, num_questions)
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            while options["limit"] is None or processed < options["limit"]:
+                batch_size = options["batch_size"]
+                if options["limit"] is not None:
+                    batch_size = min(batch_size, options["limit"] - processed)
+
+                notes = list(
+                    LearningNote.objects.filter(
+                        Q(generated_questions__isnull=True) | Q(generated_questions=[]),
+                        id__gt=last_id
+                    ).order_by('id').only('id', 'user_id', 'plain_text', 'word_count')[:batch_size]
+                )
+                if not notes:
+                    break
+
+                # Resolve cache hits here and send each distinct text to the LLM only once
+                pending = {}
+                results = {}
+                for note in notes:
+                    plain_text_content, num_questions = get_question_params(note)
+                    key = (hash_content(plain_text_content), num_questions)
+                    note.question_key = key
+
+                    if key in results or key in pending:
+                        continue
+
+                    cached_questions = get_cached_questions(plain_text_content, num_questions)
+                    if cached_questions is not None:
+                        results[key] = cached_questions
+                    else:
+                        pending[key] = (
+                            plain_text_content, executor.submit(generate, plain_text_content, num_questions))
+
+                for key, (plain_text_content, future) in pending.items():
+                    try:
+                        questions_data = future.result()
+                    except LLMUnavailableError as e:
+                        questions_data = {"error": str(e)}
+                    results[key] = questions_data
+
+                    if "error" in questions_data:
+                        self.stderr.write(f"Generation failed: {questions_data['error']}")
+                    else:
+                        store_cached_questions(plain_text_content, key[1], questions_data)
+                        generated += 1
+
+                updated_notes = []
+                for note in notes:
+                    questions_data = results[note.question_key]
+                    if "error" in questions_data:
+                        failed += 1
+                    else:
+                        note.generated_questions = questions_data
+                        updated_notes.append(note)
+
+                with transaction.atomic():
+                    # Leave out notes edited since the batch was read: their edit cleared their
+                    # questions, and the ones generated here are for the old text
+                    stored_text = dict(
+                        LearningNote.objects.select_for_update().filter(
+                            id__in=[note.id for note in updated_notes]
+                        ).values_list('id', 'plain_text'))
+                    updated_notes = [
+                        note for note in updated_notes
+                        # get_question_params derived the text of notes not backfilled yet in memory
+                        if stored_text.get(note.id) == ('' if note.has_changed('plain_text') else note.plain_text)
+                    ]
+                    LearningNote.objects.bulk_update(updated_notes, ['generated_questions'])
+
+                for user_id in {note.user_id for note in updated_notes}:
+                    bump_timeline_version(user_id)
+
+                processed += len(notes)
+                last_id = notes[-1].id
+                write_checkpoint(checkpoint, {"last_id": last_id})
+
+                self.stdout.write(f"Processed {processed} note(s), up to id {last_id}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {processed} note(s) processed, {generated} LLM call(s), {failed} failure(s)"))
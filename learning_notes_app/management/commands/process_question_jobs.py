@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from learning_notes_app.question_generator import LLMUnavailableError
+from learning_notes_app.question_service import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued question generation jobs. Any number of workers can run side by side."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Exit once the queue is empty instead of polling for new jobs.")
+        parser.add_argument(
+            "--poll-interval", type=float, default=2.0,
+            help="Seconds to wait before polling an empty queue again.")
+        parser.add_argument(
+            "--max-jobs", type=int, default=None,
+            help="Exit after processing this many jobs.")
+
+    def handle(self, *args, **options):
+        processed = 0
+
+        try:
+            while options["max_jobs"] is None or processed < options["max_jobs"]:
+                close_old_connections()
+                job = claim_next_job()
+
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                try:
+                    job = run_job(job)
+                except LLMUnavailableError as e:
+                    # Back off instead of spinning on a queue the LLM cannot serve
+                    self.stderr.write(f"Job {job.id} requeued: {e}")
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                processed += 1
+                self.stdout.write(f"Job {job.id} for note {job.note_id}: {job.status}")
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)"))
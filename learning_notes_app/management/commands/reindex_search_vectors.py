@@ -0,0 +1,90 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from learning_notes_app.management.checkpoint import read_checkpoint, write_checkpoint
+from learning_notes_app.models import LearningNote
+
+# learning_note_search_vector() is the function the search-vector triggers use (migration 0012)
+STALE_CONDITION = "search_vector IS DISTINCT FROM learning_note_search_vector(title, plain_text)"
+# Rebuilding these from an empty plain_text would drop the note body from the vector
+NOT_BACKFILLED_CONDITION = "plain_text = '' AND content <> ''"
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild out-of-date search vectors in primary-key-ordered batches, each in its own short "
+        "transaction, so it can run against the live database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of notes checked per batch.")
+        parser.add_argument(
+            "--sleep", type=float, default=0.0,
+            help="Seconds to pause between batches, to leave room for other writers and replication.")
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording the last processed note id after every batch.")
+        parser.add_argument(
+            "--resume", action="store_true",
+            help="Continue after the note id recorded in --checkpoint.")
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only count the notes whose search vector is out of date; nothing is written.")
+
+    def handle(self, *args, **options):
+        table = connection.ops.quote_name(LearningNote._meta.db_table)
+        checkpoint = options["checkpoint"]
+        dry_run = options["dry_run"]
+
+        last_id = read_checkpoint(checkpoint).get("last_id", 0) if options["resume"] else 0
+        checked = stale = skipped = 0
+        reindexable = f"{STALE_CONDITION} AND NOT ({NOT_BACKFILLED_CONDITION})"
+
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT max(id), count(*), count(*) FILTER (WHERE {NOT_BACKFILLED_CONDITION}) FROM "
+                    f"(SELECT id, plain_text, content FROM {table} WHERE id > %s ORDER BY id LIMIT %s) AS batch",
+                    [last_id, options["batch_size"]])
+                batch_end, batch_count, batch_skipped = cursor.fetchone()
+                if not batch_count:
+                    break
+                skipped += batch_skipped
+
+                # Only rows that actually differ are written, so a healthy table costs reads only
+                if dry_run:
+                    cursor.execute(
+                        f"SELECT count(*) FROM {table} WHERE id > %s AND id <= %s AND {reindexable}",
+                        [last_id, batch_end])
+                    stale += cursor.fetchone()[0]
+                else:
+                    cursor.execute(
+                        f"UPDATE {table} SET search_vector = learning_note_search_vector(title, plain_text) "
+                        f"WHERE id > %s AND id <= %s AND {reindexable}",
+                        [last_id, batch_end])
+                    stale += cursor.rowcount
+
+            checked += batch_count
+            last_id = batch_end
+            if not dry_run:
+                write_checkpoint(checkpoint, {"last_id": last_id})
+
+            self.stdout.write(
+                f"Checked {checked} note(s), up to id {last_id}: {stale} out of date, {skipped} skipped")
+
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {skipped} note(s) without plain text; run backfill_plain_text, then reindex again"))
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"Dry run: {stale} of {checked} note(s) have an out-of-date search vector"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Done: {checked} note(s) checked, {stale} search vector(s) rebuilt"))
@@ -0,0 +1,230 @@
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    'text/',
+    'application/json',
+    'application/msgpack',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/xml',
+)
+
+DEFAULT_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+
+
+class GzipEncoder:
+    def __init__(self, level):
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def available_encoders():
+    """
+    The supported content codings, most preferred first. brotli and zstd are only offered
+    when their optional packages are installed.
+    """
+    encoders = {}
+    if zstandard is not None:
+        encoders['zstd'] = ZstdEncoder
+    if brotli is not None:
+        encoders['br'] = BrotliEncoder
+    encoders['gzip'] = GzipEncoder
+
+    return encoders
+
+
+def parse_accept_encoding(header):
+    """
+    Map each coding in an Accept-Encoding header to its quality value.
+    """
+    codings = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+
+    return codings
+
+
+def choose_encoding(header, supported):
+    """
+    Pick the coding to use for a response, or None to send it uncompressed.
+
+    :param header: The request's Accept-Encoding header.
+    :param supported: Supported codings, most preferred first.
+    """
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get('*', 0.0)
+
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = codings.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+
+    return best
+
+
+def compress_stream(chunks, encoder):
+    """
+    Compress a streaming body chunk by chunk. Each chunk is flushed as soon as it is
+    compressed, so Server-Sent Events still reach the client one by one and nothing is held
+    back or buffered in full.
+    """
+    for chunk in chunks:
+        data = encoder.compress(chunk) + encoder.flush()
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+async def compress_async_stream(chunks, encoder):
+    async for chunk in chunks:
+        data = encoder.compress(chunk) + encoder.flush()
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best coding the client accepts: zstd or brotli when their
+    packages are installed, gzip otherwise.
+
+    Settings:
+
+    - COMPRESSION_MIN_SIZE: buffered responses smaller than this many bytes are sent as is
+      (streaming responses are always compressed);
+    - COMPRESSION_LEVELS: compression level per coding, e.g. {'gzip': 6, 'br': 4, 'zstd': 3}.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.encoders = available_encoders()
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.levels = {**DEFAULT_LEVELS, **getattr(settings, 'COMPRESSION_LEVELS', {})}
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def is_compressible(self, response):
+        if response.has_header('Content-Encoding') or response.status_code == 204:
+            return False
+
+        # A partial response's Content-Range counts bytes of the identity representation
+        if response.status_code == 206 or response.has_header('Content-Range'):
+            return False
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return False
+
+        return response.streaming or len(response.content) >= self.min_size
+
+    def process_response(self, request, response):
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.encoders)
+
+        if response.status_code == 304:
+            # Carry the same (weak) ETag and Vary the compressed 200 response would have had
+            if coding is not None:
+                self.weaken_etag(response)
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+
+        if not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if coding is None:
+            return response
+
+        encoder = self.encoders[coding](self.levels[coding])
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(response.streaming_content, encoder)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoder)
+            # The compressed size is not known until the stream has been sent
+            del response.headers['Content-Length']
+        else:
+            compressed = encoder.compress(response.content) + encoder.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        self.weaken_etag(response)
+        response.headers['Content-Encoding'] = coding
+
+        return response
+
+    @staticmethod
+    def weaken_etag(response):
+        # The encoded bytes differ from the identity representation, so a strong ETag must
+        # become weak (RFC 9110 8.8.1); etag_matches compares weakly, so 304s keep working
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
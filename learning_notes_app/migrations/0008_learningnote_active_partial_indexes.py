@@ -0,0 +1,32 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:23
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without holding a write lock on learning_note
+    atomic = False
+
+    dependencies = [
+        ("learning_notes_app", "0007_learningnote_generated_questions"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="learningnote",
+            index=models.Index(
+                condition=models.Q(("archived", False)),
+                fields=["user", "-created_at", "-id"],
+                name="learning_note_user_active_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="learningnote",
+            index=models.Index(
+                condition=models.Q(("archived", False)),
+                fields=["collection", "-created_at", "-id"],
+                name="learning_note_coll_active_idx",
+            ),
+        ),
+    ]
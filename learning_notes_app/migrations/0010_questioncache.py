@@ -0,0 +1,44 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("learning_notes_app", "0009_questiongenerationjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuestionCache",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64)),
+                ("num_questions", models.PositiveSmallIntegerField()),
+                ("llm_model", models.CharField(max_length=100)),
+                ("questions", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Question Cache Entry",
+                "verbose_name_plural": "Question Cache",
+                "db_table": "question_cache",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="questioncache",
+            constraint=models.UniqueConstraint(
+                fields=("content_hash", "num_questions", "llm_model"),
+                name="question_cache_key",
+            ),
+        ),
+    ]
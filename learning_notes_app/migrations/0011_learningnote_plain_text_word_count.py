@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("learning_notes_app", "0010_questioncache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="learningnote",
+            name="plain_text",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.AddField(
+            model_name="learningnote",
+            name="word_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# The vector is built from the title (weight A) and the plain-text body (weight B) instead of
+# the raw HTML, and the UPDATE trigger only fires when one of those columns actually changed,
+# so archiving, moving or re-labelling a note no longer re-tokenizes it.
+FORWARD_SQL = """
+CREATE OR REPLACE FUNCTION learning_note_search_vector(title text, body text)
+RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT setweight(to_tsvector('pg_catalog.english', coalesce(title, '')), 'A') ||
+           setweight(to_tsvector('pg_catalog.english', coalesce(body, '')), 'B')
+$$;
+
+CREATE OR REPLACE FUNCTION learning_note_search_vector_trigger()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := learning_note_search_vector(NEW.title, NEW.plain_text);
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS learningnote_search_vector_update ON learning_note;
+
+CREATE TRIGGER learningnote_search_vector_insert
+BEFORE INSERT ON learning_note
+FOR EACH ROW EXECUTE FUNCTION learning_note_search_vector_trigger();
+
+CREATE TRIGGER learningnote_search_vector_update
+BEFORE UPDATE OF title, plain_text ON learning_note
+FOR EACH ROW
+WHEN (OLD.title IS DISTINCT FROM NEW.title OR OLD.plain_text IS DISTINCT FROM NEW.plain_text)
+EXECUTE FUNCTION learning_note_search_vector_trigger();
+"""
+
+REVERSE_SQL = """
+DROP TRIGGER IF EXISTS learningnote_search_vector_insert ON learning_note;
+DROP TRIGGER IF EXISTS learningnote_search_vector_update ON learning_note;
+
+CREATE TRIGGER learningnote_search_vector_update
+BEFORE INSERT OR UPDATE ON learning_note
+FOR EACH ROW EXECUTE FUNCTION
+tsvector_update_trigger(search_vector, 'pg_catalog.english', title, content);
+
+DROP FUNCTION IF EXISTS learning_note_search_vector_trigger();
+DROP FUNCTION IF EXISTS learning_note_search_vector(text, text);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("learning_notes_app", "0011_learningnote_plain_text_word_count"),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
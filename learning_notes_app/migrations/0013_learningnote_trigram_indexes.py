@@ -0,0 +1,24 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Build the index without holding a write lock on learning_note
+    atomic = False
+
+    dependencies = [
+        ("learning_notes_app", "0012_learningnote_weighted_search_vector"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name="learningnote",
+            index=GinIndex(
+                fields=["title"],
+                name="learning_note_title_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
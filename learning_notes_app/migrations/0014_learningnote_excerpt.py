@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("learning_notes_app", "0013_learningnote_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="learningnote",
+            name="excerpt",
+            field=models.CharField(blank=True, default="", max_length=280),
+        ),
+    ]
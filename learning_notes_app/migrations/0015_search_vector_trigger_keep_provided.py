@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Bulk imports compute search vectors for all their rows in the merge statement itself, so
+# the INSERT trigger keeps a vector that is already provided. ORM inserts never set one.
+FORWARD_SQL = """
+CREATE OR REPLACE FUNCTION learning_note_search_vector_trigger()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' AND NEW.search_vector IS NOT NULL THEN
+        RETURN NEW;
+    END IF;
+    NEW.search_vector := learning_note_search_vector(NEW.title, NEW.plain_text);
+    RETURN NEW;
+END
+$$;
+"""
+
+REVERSE_SQL = """
+CREATE OR REPLACE FUNCTION learning_note_search_vector_trigger()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := learning_note_search_vector(NEW.title, NEW.plain_text);
+    RETURN NEW;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("learning_notes_app", "0014_learningnote_excerpt"),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -1,10 +1,12 @@
 from pyexpat import model
-from django.db import models
+from django.db import models, transaction
+from django.db.models import DEFERRED
 from django.contrib.auth.models import User, AbstractUser
 from django.utils import timezone
 from django.contrib.postgres.search import SearchVectorField
 from django.contrib.postgres.indexes import GinIndex
 from django.contrib.postgres.search import SearchVector
+from .utils import extract_text_from_html, make_excerpt
 
 class Label(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -31,13 +33,23 @@ class Collection(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Collection'
 
-    def archive_collection(self):
-        # Archived the collection and all related learning notes
-        self.is_archived = True
-        self.save()
+    def archive_notes_batch(self, archived, after_id=0, batch_size=500):
+        """
+        Archive (or unarchive) the next `batch_size` notes of the collection with an id above
+        `after_id`, in their own short transaction, and bump their `updated_at`.
 
-        # Archive all learning notes that belong to this collection
-        self.collection_notes.update(archived=True)
+        :return: The ids of the notes that were changed, in ascending order.
+        """
+        with transaction.atomic():
+            note_ids = list(
+                self.collection_notes.filter(id__gt=after_id, archived=not archived)
+                .order_by('id').values_list('id', flat=True)[:batch_size])
+
+            if note_ids:
+                LearningNote.objects.filter(id__in=note_ids, archived=not archived).update(
+                    archived=archived, updated_at=timezone.now())
+
+        return note_ids
 
     def __str__(self):
         return self.name
@@ -55,6 +67,10 @@ class LearningNote(models.Model):
     collection = models.ForeignKey(
         Collection, null=True, blank=True, on_delete=models.SET_NULL, related_name='collection_notes')
     generated_questions = models.JSONField(null=True, blank=True)
+    # Derived from content on save, so readers never have to parse the HTML
+    plain_text = models.TextField(blank=True, default='')
+    word_count = models.PositiveIntegerField(default=0)
+    excerpt = models.CharField(max_length=280, blank=True, default='')
 
     # Add SearchVectorField for full-text search
     search_vector = SearchVectorField(null=True)
@@ -66,14 +82,195 @@ class LearningNote(models.Model):
         verbose_name_plural = 'Learning Notes'
         indexes = [
             models.Index(fields=['user', 'created_at']),
+            # Partial indexes matching the timeline predicates (active notes only), ordered
+            # like the timeline so a page can be read straight off the index
+            models.Index(fields=['user', '-created_at', '-id'],
+                         name='learning_note_user_active_idx', condition=models.Q(archived=False)),
+            models.Index(fields=['collection', '-created_at', '-id'],
+                         name='learning_note_coll_active_idx', condition=models.Q(archived=False)),
             GinIndex(fields=['search_vector']),
+            # Trigram index for typo-tolerant typeahead on partially typed titles
+            GinIndex(fields=['title'], name='learning_note_title_trgm_idx', opclasses=['gin_trgm_ops']),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so save() can tell which fields actually changed
+        instance._loaded_values = {
+            field: value for field, value in zip(field_names, values) if value is not DEFERRED}
+
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # Also called when a deferred field is first accessed
+        self._remember_loaded_values(kwargs.get('fields'))
+
+    def _remember_loaded_values(self, fields=None):
+        loaded_values = getattr(self, '_loaded_values', {})
+
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (
+                    fields is None or field.name in fields or field.attname in fields):
+                loaded_values[field.attname] = self.__dict__[field.attname]
+
+        self._loaded_values = loaded_values
+
+    def has_changed(self, *fields):
+        """
+        Whether any of the given fields differs from the value loaded from the database.
+        Unsaved notes count as changed.
+        """
+        loaded_values = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded_values is None:
+            return True
+
+        for field in fields:
+            if field not in loaded_values:
+                # Deferred when loaded, so it only changed if it has been assigned since
+                if field in self.__dict__:
+                    return True
+            elif self.__dict__.get(field, loaded_values[field]) != loaded_values[field]:
+                return True
+
+        return False
+
+    def refresh_derived_text(self):
+        """
+        Recompute the fields derived from `content` and return their names.
+        """
+        self.plain_text = extract_text_from_html(self.content)
+        self.word_count = len(self.plain_text.split())
+        self.excerpt = make_excerpt(self.plain_text, self._meta.get_field('excerpt').max_length)
+
+        return ['plain_text', 'word_count', 'excerpt']
+
     def save(self, *args, **kwargs):
         if not self.id:
             self.created_at = timezone.now()
         self.updated_at = timezone.now()
+
+        update_fields = kwargs.get('update_fields')
+        content_changed = self.has_changed('content') and (update_fields is None or 'content' in update_fields)
+        # A note saved before plain_text existed gets it now; otherwise the search-vector
+        # trigger would rebuild its vector from the title and an empty body
+        not_backfilled = self.__dict__.get('plain_text') == '' and bool(self.content)
+
+        if content_changed or not_backfilled:
+            changed_fields = self.refresh_derived_text()
+
+            if content_changed and not self._state.adding:
+                # Questions generated from the old content no longer apply
+                self.generated_questions = None
+                changed_fields.append('generated_questions')
+
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *changed_fields}
+
         super(LearningNote, self).save(*args, **kwargs)
 
+        self._remember_loaded_values(kwargs.get('update_fields'))
+
     def __str__(self):
         return self.title
+
+
+class QuestionGenerationJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+
+    note = models.ForeignKey(
+        LearningNote, on_delete=models.CASCADE, related_name='question_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'question_generation_job'
+        ordering = ['created_at']
+        verbose_name = 'Question Generation Job'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.note_id} ({self.status})'
+
+
+class QuestionCache(models.Model):
+    """
+    Generated questions keyed by a hash of the note's plain text, shared by every note with
+    the same content so identical text is only sent to the LLM once.
+    """
+    content_hash = models.CharField(max_length=64)
+    num_questions = models.PositiveSmallIntegerField()
+    llm_model = models.CharField(max_length=100)
+    questions = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'question_cache'
+        verbose_name = 'Question Cache Entry'
+        verbose_name_plural = 'Question Cache'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_hash', 'num_questions', 'llm_model'], name='question_cache_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.content_hash[:12]} ({self.num_questions} questions, {self.llm_model})'
+
+
+class CollectionArchiveJob(models.Model):
+    """
+    Archives or unarchives the notes of a collection in primary-key batches. `last_note_id`
+    is the checkpoint a retried job resumes from.
+    """
+    class Action(models.TextChoices):
+        ARCHIVE = 'archive', 'Archive'
+        UNARCHIVE = 'unarchive', 'Unarchive'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+
+    collection = models.ForeignKey(
+        Collection, on_delete=models.CASCADE, related_name='archive_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    action = models.CharField(max_length=20, choices=Action.choices)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    last_note_id = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'collection_archive_job'
+        ordering = ['created_at']
+        verbose_name = 'Collection Archive Job'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    @property
+    def archived(self):
+        return self.action == self.Action.ARCHIVE
+
+    def __str__(self):
+        return f'{self.action} {self.collection_id} ({self.status})'
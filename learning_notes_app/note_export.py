@@ -0,0 +1,49 @@
+import orjson
+
+from .models import LearningNote
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def serialize_export_note(note):
+    return {
+        'id': note.id,
+        'title': note.title,
+        'content': note.content,
+        'created_at': note.created_at,
+        'updated_at': note.updated_at,
+        'archived': note.archived,
+        'collection': {'id': note.collection.id, 'name': note.collection.name} if note.collection else None,
+        'labels': [{'id': label.id, 'name': label.name, 'color': label.color} for label in note.labels.all()],
+    }
+
+
+def export_notes(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield every note of the user as an export dict, oldest first.
+
+    Notes are read through a server-side cursor, `chunk_size` at a time, and the labels of
+    each chunk are prefetched with one query, so memory use does not grow with the number
+    of notes.
+    """
+    notes = LearningNote.objects.filter(user=user).select_related('collection').prefetch_related(
+        'labels').defer('plain_text', 'search_vector', 'generated_questions').order_by('id')
+
+    for note in notes.iterator(chunk_size=chunk_size):
+        yield serialize_export_note(note)
+
+
+def export_ndjson(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the user's notes as NDJSON, one JSON object per line, in blocks of `chunk_size`
+    lines so streaming and compression are not fed one tiny write per note.
+    """
+    lines = []
+    for note in export_notes(user, chunk_size):
+        lines.append(orjson.dumps(note, option=orjson.OPT_UTC_Z))
+        if len(lines) >= chunk_size:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
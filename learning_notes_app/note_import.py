@@ -0,0 +1,315 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Collection, Label, LearningNote
+from .timeline_cache import bump_timeline_version
+from .utils import extract_text_from_html, make_excerpt
+
+IMPORT_BATCH_SIZE = 1000
+DEFAULT_LABEL_COLOR = '#9e9e9e'
+MAX_REPORTED_ERRORS = 100
+
+ImportRow = namedtuple('ImportRow', [
+    'line', 'title', 'content', 'plain_text', 'word_count', 'excerpt', 'created_at', 'archived',
+    'collection_name', 'labels'])
+
+STAGING_COLUMNS = ImportRow._fields
+
+# The staging table draws ids from the notes' own sequence, so every row knows its final id
+# before the merge and label rows can be joined to it without a round trip
+STAGING_TABLE_SQL = """
+CREATE TEMPORARY TABLE learning_note_import (
+    id integer NOT NULL DEFAULT nextval(%s::regclass),
+    line integer NOT NULL,
+    title text NOT NULL,
+    content text NOT NULL,
+    plain_text text NOT NULL,
+    word_count integer NOT NULL,
+    excerpt text NOT NULL,
+    created_at timestamptz NOT NULL,
+    archived boolean NOT NULL,
+    collection_name text NOT NULL,
+    labels jsonb NOT NULL
+) ON COMMIT DROP
+"""
+
+MERGE_COLLECTIONS_SQL = """
+INSERT INTO {collection} (name, is_archived, created_by_id, created_at, updated_at)
+SELECT DISTINCT s.collection_name, false, %(user_id)s, now(), now()
+FROM learning_note_import s
+WHERE s.collection_name <> ''
+  AND NOT EXISTS (
+      SELECT 1 FROM {collection} c WHERE c.created_by_id = %(user_id)s AND c.name = s.collection_name)
+"""
+
+# Label names are unique across all users: a name another user already owns is left out
+MERGE_LABELS_SQL = """
+INSERT INTO {label} (name, color, created_by_id)
+SELECT DISTINCT ON (item->>'name') item->>'name', item->>'color', %(user_id)s
+FROM learning_note_import s, jsonb_array_elements(s.labels) AS item
+ORDER BY item->>'name'
+ON CONFLICT (name) DO NOTHING
+"""
+
+# The search vector is computed here, in one set-based pass; the INSERT trigger keeps a
+# vector that is already provided (migration 0015)
+MERGE_NOTES_SQL = """
+INSERT INTO {note} (id, user_id, title, content, plain_text, word_count, excerpt, created_at, updated_at,
+                    archived, collection_id, search_vector)
+SELECT s.id, %(user_id)s, s.title, s.content, s.plain_text, s.word_count, s.excerpt, s.created_at, now(),
+       s.archived, c.id, learning_note_search_vector(s.title, s.plain_text)
+FROM learning_note_import s
+LEFT JOIN LATERAL (
+    SELECT min(id) AS id FROM {collection}
+    WHERE created_by_id = %(user_id)s AND name = s.collection_name
+) c ON s.collection_name <> ''
+"""
+
+MERGE_NOTE_LABELS_SQL = """
+INSERT INTO {note_labels} (learningnote_id, label_id)
+SELECT DISTINCT s.id, l.id
+FROM learning_note_import s, jsonb_array_elements(s.labels) AS item
+JOIN {label} l ON l.name = item->>'name' AND l.created_by_id = %(user_id)s
+ON CONFLICT DO NOTHING
+"""
+
+UNRESOLVED_LABELS_SQL = """
+SELECT DISTINCT item->>'name'
+FROM learning_note_import s, jsonb_array_elements(s.labels) AS item
+WHERE NOT EXISTS (SELECT 1 FROM {label} l WHERE l.name = item->>'name' AND l.created_by_id = %(user_id)s)
+ORDER BY 1
+"""
+
+
+def read_ndjson(stream):
+    """
+    Yield (line number, record) for each non-blank line of an NDJSON text stream. Lines
+    that are not JSON objects are yielded as a ValueError in place of the record.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f"Invalid JSON: {e}")
+            continue
+        yield line_number, record if isinstance(record, dict) else ValueError("Expected a JSON object")
+
+
+def read_csv(stream):
+    """
+    Yield (line number, record) for each row of a CSV text stream with a header row. The
+    `labels` column holds label names separated by semicolons.
+    """
+    reader = csv.DictReader(stream)
+    for record in reader:
+        labels = record.get('labels') or ''
+        record['labels'] = [name for name in (part.strip() for part in labels.split(';')) if name]
+        yield reader.line_num, record
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+def detect_format(filename, content_type=None):
+    """
+    Pick the reader for an uploaded file from its name or content type; NDJSON by default.
+    """
+    if (filename or '').lower().endswith('.csv') or content_type == 'text/csv':
+        return 'csv'
+    return 'ndjson'
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value in (None, ''):
+        return False
+    if str(value).strip().lower() in ('1', 'true', 'yes'):
+        return True
+    if str(value).strip().lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"Invalid archived value: {value!r}")
+
+
+def _check_text(field, value):
+    # Postgres text and jsonb cannot store NUL, and COPY would fail the whole import on it
+    if '\x00' in value:
+        raise ValueError(f"{field} contains a NUL character")
+
+
+def _parse_labels(value):
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise ValueError("labels must be a list")
+
+    labels = {}
+    for item in value:
+        if isinstance(item, dict):
+            name, color = item.get('name'), item.get('color')
+        else:
+            name, color = item, None
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("Every label needs a name")
+        name = name.strip()
+        _check_text('label name', name)
+        if len(name) > Label._meta.get_field('name').max_length:
+            raise ValueError(f"Label name too long: {name[:20]}…")
+        if not isinstance(color, str) or '\x00' in color or len(color) > Label._meta.get_field('color').max_length:
+            color = DEFAULT_LABEL_COLOR
+        labels.setdefault(name, {'name': name, 'color': color})
+
+    return list(labels.values())
+
+
+def validate_record(line_number, record):
+    """
+    Turn one imported record into an ImportRow, deriving the same text columns `save()` would.
+
+    :raises ValueError: If the record cannot be imported.
+    """
+    title = record.get('title')
+    content = record.get('content')
+
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("title is required")
+    if len(title) > LearningNote._meta.get_field('title').max_length:
+        raise ValueError("title is too long")
+    if not isinstance(content, str) or not content:
+        raise ValueError("content is required")
+    _check_text('title', title)
+    _check_text('content', content)
+
+    created_at = timezone.now()
+    if record.get('created_at'):
+        created_at = parse_datetime(str(record['created_at']))
+        if created_at is None:
+            raise ValueError(f"Invalid created_at: {record['created_at']!r}")
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at, dt_timezone.utc)
+
+    collection = record.get('collection')
+    collection_name = collection.get('name') if isinstance(collection, dict) else collection
+    if collection_name is not None:
+        if not isinstance(collection_name, str):
+            raise ValueError("collection must be a name")
+        collection_name = collection_name.strip() or None
+        _check_text('collection name', collection_name or '')
+        if collection_name and len(collection_name) > Collection._meta.get_field('name').max_length:
+            raise ValueError("collection name is too long")
+
+    plain_text = extract_text_from_html(content)
+
+    return ImportRow(
+        line=line_number,
+        title=title,
+        content=content,
+        plain_text=plain_text,
+        word_count=len(plain_text.split()),
+        excerpt=make_excerpt(plain_text, LearningNote._meta.get_field('excerpt').max_length),
+        created_at=created_at,
+        archived=_parse_bool(record.get('archived')),
+        collection_name=collection_name,
+        labels=_parse_labels(record.get('labels')),
+    )
+
+
+def _copy_batch(cursor, rows):
+    buffer = io.StringIO()
+    # Every string is quoted, and COPY never reads a quoted value as NULL
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for row in rows:
+        writer.writerow([
+            row.line, row.title, row.content, row.plain_text, row.word_count, row.excerpt,
+            row.created_at.isoformat(), 't' if row.archived else 'f',
+            row.collection_name or '', json.dumps(row.labels),
+        ])
+    buffer.seek(0)
+
+    cursor.copy_expert(
+        f"COPY learning_note_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def import_notes(user, records, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import notes for a user from (line number, record) pairs, as produced by `read_ndjson`
+    or `read_csv`.
+
+    Records are validated in batches and each valid batch is loaded with COPY into a
+    temporary staging table. Collections, labels, notes and note labels are then merged with
+    one set-based statement each, all in a single transaction. Invalid records are skipped
+    and reported.
+
+    :return: A dict with the number of imported notes, the number of invalid records, the
+             first MAX_REPORTED_ERRORS errors and any label names already owned by another user.
+    """
+    tables = {
+        'note': connection.ops.quote_name(LearningNote._meta.db_table),
+        'collection': connection.ops.quote_name(Collection._meta.db_table),
+        'label': connection.ops.quote_name(Label._meta.db_table),
+        'note_labels': connection.ops.quote_name(LearningNote.labels.through._meta.db_table),
+    }
+    params = {'user_id': user.id}
+    errors = []
+    invalid = 0
+    staged = 0
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [LearningNote._meta.db_table])
+        cursor.execute(STAGING_TABLE_SQL, [cursor.fetchone()[0]])
+
+        batch = []
+        for line_number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                batch.append(validate_record(line_number, record))
+            except ValueError as e:
+                invalid += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'line': line_number, 'error': str(e)})
+                continue
+
+            if len(batch) >= batch_size:
+                _copy_batch(cursor, batch)
+                staged += len(batch)
+                batch = []
+
+        if batch:
+            _copy_batch(cursor, batch)
+            staged += len(batch)
+
+        unresolved_labels = []
+        if staged:
+            cursor.execute('ANALYZE learning_note_import')
+            cursor.execute(MERGE_COLLECTIONS_SQL.format(**tables), params)
+            cursor.execute(MERGE_LABELS_SQL.format(**tables), params)
+            cursor.execute(MERGE_NOTES_SQL.format(**tables), params)
+            cursor.execute(MERGE_NOTE_LABELS_SQL.format(**tables), params)
+            cursor.execute(UNRESOLVED_LABELS_SQL.format(**tables), params)
+            unresolved_labels = [name for name, in cursor.fetchall()]
+
+        # ON COMMIT DROP only fires at the outermost commit, which is later than this when
+        # the import runs inside another atomic block
+        cursor.execute('DROP TABLE learning_note_import')
+
+    if staged:
+        bump_timeline_version(user.id)
+
+    return {
+        'imported': staged,
+        'invalid': invalid,
+        'errors': errors,
+        'unresolved_labels': unresolved_labels,
+    }
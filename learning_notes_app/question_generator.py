@@ -1,48 +1,281 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
 from operator import truediv
+
+import httpx
+import openai
 from openai import OpenAI
 from decouple import config
 
 # README: documentation of Openai's API https://platform.openai.com/docs/api-reference/chat/create
 
-def extract_question(lines):
-     question_section = list(filter(lambda x: x.startswith("<Question>"), lines))[0]
-     question = question_section.replace("<Question>: ", "")
+DEFAULT_ENGINE = "gpt-4o-mini"
+
+# Outbound LLM traffic is shared by every thread in the process
+LLM_MAX_CONCURRENCY = config('OPENAI_MAX_CONCURRENCY', default=8, cast=int)
+LLM_SLOT_TIMEOUT = config('OPENAI_SLOT_TIMEOUT', default=2.0, cast=float)
+LLM_REQUEST_TIMEOUT = config('OPENAI_REQUEST_TIMEOUT', default=30.0, cast=float)
+LLM_MAX_RETRIES = config('OPENAI_MAX_RETRIES', default=1, cast=int)
+LLM_FAILURE_THRESHOLD = config('OPENAI_FAILURE_THRESHOLD', default=5, cast=int)
+LLM_RESET_TIMEOUT = config('OPENAI_RESET_TIMEOUT', default=30.0, cast=float)
+
+# "text" parses the ---separated format; "json" asks for structured output matching QUESTIONS_JSON_SCHEMA
+LLM_OUTPUT_FORMAT = config('OPENAI_OUTPUT_FORMAT', default='text')
+
+QUESTIONS_JSON_SCHEMA = {
+     "name": "multiple_choice_questions",
+     "strict": True,
+     "schema": {
+          "type": "object",
+          "properties": {
+               "questions": {
+                    "type": "array",
+                    "items": {
+                         "type": "object",
+                         "properties": {
+                              "question": {"type": "string"},
+                              "options": {"type": "array", "items": {"type": "string"}},
+                              "answer": {"type": "string"}
+                         },
+                         "required": ["question", "options", "answer"],
+                         "additionalProperties": False
+                    }
+               }
+          },
+          "required": ["questions"],
+          "additionalProperties": False
+     }
+}
+
+class LLMUnavailableError(Exception):
+     """
+     Raised instead of calling OpenAI when the circuit is open or every request slot is busy.
+     """
+
+class CircuitBreaker:
+     """
+     Fails fast after `failure_threshold` consecutive upstream failures. Once `reset_timeout`
+     has passed, a single trial request is let through; its outcome closes or reopens the circuit.
+     """
+     def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+          self.failure_threshold = failure_threshold
+          self.reset_timeout = reset_timeout
+          self._clock = clock
+          self._lock = threading.Lock()
+          self._failures = 0
+          self._opened_at = None
+          self._trial_in_flight = False
+
+     @property
+     def is_open(self):
+          with self._lock:
+               return self._opened_at is not None and (
+                    self._trial_in_flight or self._clock() - self._opened_at < self.reset_timeout)
+
+     def allow_request(self):
+          with self._lock:
+               if self._opened_at is None:
+                    return True
+
+               if not self._trial_in_flight and self._clock() - self._opened_at >= self.reset_timeout:
+                    self._trial_in_flight = True
+                    return True
+
+               return False
+
+     def record_success(self):
+          with self._lock:
+               self._failures = 0
+               self._opened_at = None
+               self._trial_in_flight = False
+
+     def record_failure(self):
+          with self._lock:
+               self._failures += 1
+               if self._trial_in_flight or self._failures >= self.failure_threshold:
+                    self._opened_at = self._clock()
+               self._trial_in_flight = False
+
+     def release_trial(self):
+          """
+          Gives up a trial request that ended without reaching the upstream service.
+          """
+          with self._lock:
+               self._trial_in_flight = False
+
+llm_circuit_breaker = CircuitBreaker(LLM_FAILURE_THRESHOLD, LLM_RESET_TIMEOUT)
+llm_request_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_shared_client():
+     """
+     Returns the process-wide OpenAI client, whose connection pool is reused across requests.
+     """
+     global _shared_client
+
+     if _shared_client is None:
+          with _shared_client_lock:
+               if _shared_client is None:
+                    _shared_client = OpenAI(
+                         organization=config('OPENAI_ORG_ID'),
+                         project=config('OPENAI_PROJECT_ID'),
+                         api_key=config('OPENAI_API_KEY'),
+                         timeout=LLM_REQUEST_TIMEOUT,
+                         max_retries=LLM_MAX_RETRIES,
+                         http_client=httpx.Client(
+                              timeout=LLM_REQUEST_TIMEOUT,
+                              limits=httpx.Limits(
+                                   max_connections=LLM_MAX_CONCURRENCY,
+                                   max_keepalive_connections=LLM_MAX_CONCURRENCY
+                                   )
+                              )
+                         )
 
-     return question
+     return _shared_client
+
+def is_upstream_failure(error):
+     """
+     Whether an error means OpenAI is degraded, as opposed to a problem with our own request.
+     """
+     if isinstance(error, openai.APIConnectionError):
+          return True
+
+     return isinstance(error, openai.APIStatusError) and (
+          error.status_code >= 500 or error.status_code == 429)
 
 def is_option(line):
      return line.startswith("A)") or line.startswith("B)") or line.startswith("C)") or line.startswith("D)")
 
-def extract_options(lines):
-     return list(filter(is_option, lines))
+def extract_question_content(section):
+     """
+     Parses one ---separated section in a single pass over its lines.
 
-def extract_answer(lines):
-     answer_section = list(filter(lambda x: x.startswith("<Answer>"), lines))[0]
-     answer = answer_section.replace("<Answer>: ", "")
+     :param section: The text of one question.
+     :return: A dictionary with the question, options, and answer, or None if the section
+              has no question or no answer (e.g. an empty trailing section).
+     """
+     question = None
+     options = []
+     answer = None
 
-     return answer
+     for line in section.split("\n"):
+          line = line.lstrip()
 
-def extract_question_content(section):
-     lines = section.split("\n")
+          if line.startswith("<Question>"):
+               if question is None:
+                    question = line.replace("<Question>: ", "")
+          elif is_option(line):
+               options.append(line)
+          elif line.startswith("<Answer>"):
+               if answer is None:
+                    answer = line.replace("<Answer>: ", "")
 
-     question = extract_question(lines)
-     options = extract_options(lines)
-     answer = extract_answer(lines)
+     if question is None or answer is None:
+          return None
 
      return {"question": question, "options": options, "answer": answer}
 
-class QuestionGenerator:
+def parse_json_questions(text):
+     """
+     Parses a structured-output completion, dropping any question that is missing a field.
+
+     :param text: A JSON document matching QUESTIONS_JSON_SCHEMA.
+     :return: A list of question dictionaries.
+     """
+     questions = []
+
+     for item in json.loads(text).get("questions", []):
+          if not isinstance(item, dict):
+               continue
+
+          question, options, answer = item.get("question"), item.get("options"), item.get("answer")
+          if isinstance(question, str) and isinstance(options, list) and isinstance(answer, str):
+               questions.append({"question": question, "options": options, "answer": answer})
+
+     return questions
+
+class QuestionStreamParser:
+     """
+     Parses questions out of a streamed completion, one as soon as its section is complete.
+     """
      def __init__(self):
-          self.api_key = config('OPENAI_API_KEY')
-          self.engine = "gpt-4o-mini"
+          self._buffer = ""
+
+     def feed(self, text):
+          """
+          Adds streamed text and returns the questions whose section has just been closed by ---.
+          """
+          self._buffer += text
+          questions = []
+
+          while "---" in self._buffer:
+               section, self._buffer = self._buffer.split("---", 1)
+               question = extract_question_content(section)
+               if question is not None:
+                    questions.append(question)
+
+          return questions
+
+     def close(self):
+          """
+          Returns the final question, which is not followed by a separator.
+          """
+          section, self._buffer = self._buffer, ""
+          question = extract_question_content(section)
+
+          return [question] if question is not None else []
+
+class QuestionGenerator:
+     def __init__(self, client=None, circuit_breaker=None, request_slots=None, output_format=None):
+          """
+          :param client: An OpenAI-compatible client. Defaults to the shared client built from the OPENAI_*
+                         settings; pass a stub to run without network access.
+          :param circuit_breaker: Defaults to the process-wide circuit breaker.
+          :param request_slots: A semaphore capping requests in flight. Defaults to the process-wide one.
+          :param output_format: "text" or "json" (structured output). Defaults to OPENAI_OUTPUT_FORMAT.
+                                Streaming always uses the text format.
+          """
+          self.output_format = output_format or LLM_OUTPUT_FORMAT
+          self.engine = DEFAULT_ENGINE
           self.max_tokens = 1000
           self.temperature = 0.7  # Controls the creativity of the output
 
-          self.client = OpenAI(
-               organization=config('OPENAI_ORG_ID'),
-               project=config('OPENAI_PROJECT_ID'),
-               api_key=self.api_key
-               )
+          self.client = client if client is not None else get_shared_client()
+          self.circuit_breaker = circuit_breaker or llm_circuit_breaker
+          self.request_slots = request_slots or llm_request_slots
+
+     @contextmanager
+     def _request_slot(self):
+          """
+          Holds one of the shared request slots for the duration of an upstream call, and feeds
+          the outcome to the circuit breaker.
+
+          :raises LLMUnavailableError: If no slot frees up in time or the circuit is open.
+          """
+          if not self.request_slots.acquire(timeout=LLM_SLOT_TIMEOUT):
+               raise LLMUnavailableError("Too many question generation requests are in flight")
+
+          try:
+               if not self.circuit_breaker.allow_request():
+                    raise LLMUnavailableError("The question generation service is unavailable")
+
+               try:
+                    yield
+               except BaseException as e:
+                    # Includes GeneratorExit from a stream the client stopped reading
+                    if is_upstream_failure(e):
+                         self.circuit_breaker.record_failure()
+                    else:
+                         self.circuit_breaker.release_trial()
+                    raise
+               else:
+                    self.circuit_breaker.record_success()
+          finally:
+               self.request_slots.release()
 
      def _format_prompt(self, content, num_questions):
           """
@@ -68,32 +301,62 @@ class QuestionGenerator:
           Each question should be seperated by ---
           """
 
+     def _format_json_prompt(self, content, num_questions):
+          """
+          Formats the prompt for a structured-output request.
+
+          :param content: The content for the prompt.
+          :return: The formatted prompt string.
+          """
+          return f"""
+          You are an expert Multiple-Choice Question maker.
+          Create {num_questions} multiple-choice questions based on the following content:
+          {content}
+
+          Give each question four options prefixed with "A) ", "B) ", "C) " and "D) ",
+          and repeat the correct option, prefix included, as the answer.
+          """
+
      def _parse_questions(self, text):
           """
           Parses multiple-choice questions from OpenAI's response text.
 
+          Malformed sections are skipped rather than failing the whole completion.
+
           :param text: The raw text returned by the OpenAI API.
           :return: A list of question dictionaries, each containing question, options, and answer.
           """
+          if self.output_format == "json":
+               return parse_json_questions(text)
+
           questions = []
           sections = text.split("---")
 
           for section in sections:
                section_content = extract_question_content(section)
 
-               questions.append(section_content)
+               if section_content is not None:
+                    questions.append(section_content)
 
           return questions
 
-     def send_request(self, content, num_questions):
-          prompt = self._format_prompt(content, num_questions)
+     def send_request(self, content, num_questions, stream=False):
+          options = {}
+
+          if self.output_format == "json" and not stream:
+               prompt = self._format_json_prompt(content, num_questions)
+               options["response_format"] = {"type": "json_schema", "json_schema": QUESTIONS_JSON_SCHEMA}
+          else:
+               prompt = self._format_prompt(content, num_questions)
 
           completion = self.client.chat.completions.create(
                          model=self.engine,
                          messages=[{"role": "user", "content": prompt}],
                          temperature=self.temperature,
                          max_tokens=self.max_tokens,
-                         n=1
+                         n=1,
+                         stream=stream,
+                         **options
                          )
 
           return completion
@@ -104,13 +367,42 @@ class QuestionGenerator:
 
           :param content: The content from which to generate questions.
           :param num_questions: The number of questions to generate.
-          :return: A list of dictionaries, each containing a question, options, and the correct answer.
+          :return: A list of dictionaries, each containing a question, options, and the correct answer,
+                   or a dictionary with an "error" if the request failed or no question could be parsed.
+          :raises LLMUnavailableError: If the request was refused without calling OpenAI.
           """
           try:
-               response = self.send_request(content, num_questions)
+               with self._request_slot():
+                    response = self.send_request(content, num_questions)
                questions = self._parse_questions(response.choices[0].message.content)
 
+               if not questions:
+                    return {"error": "No questions could be parsed from the completion"}
+
                return questions
 
+          except LLMUnavailableError:
+               raise
           except Exception as e:
                return {"error": str(e)}
+
+     def stream_questions(self, content, num_questions=3):
+          """
+          Streams the completion and yields each question as soon as it has been generated.
+
+          :param content: The content from which to generate questions.
+          :param num_questions: The number of questions to generate.
+          :return: A generator of dictionaries, each containing a question, options, and the correct answer.
+          :raises LLMUnavailableError: If the request was refused without calling OpenAI.
+          """
+          parser = QuestionStreamParser()
+
+          # The slot is held until the stream has been read to the end
+          with self._request_slot():
+               for chunk in self.send_request(content, num_questions, stream=True):
+                    if not chunk.choices:
+                         continue
+
+                    yield from parser.feed(chunk.choices[0].delta.content or "")
+
+          yield from parser.close()
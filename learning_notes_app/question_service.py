@@ -0,0 +1,195 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import LearningNote, QuestionCache, QuestionGenerationJob
+from .question_generator import DEFAULT_ENGINE, LLMUnavailableError, QuestionGenerator
+from .timeline_cache import bump_timeline_version
+
+
+def count_questions(content_length):
+    if content_length <= 100:
+        num_questions = 1
+    elif content_length > 100 and content_length <= 200:
+        num_questions = 2
+    elif content_length > 200 and content_length <= 500:
+        num_questions = 4
+    else:
+        num_questions = 5
+
+    return num_questions
+
+
+def get_question_params(note):
+    """
+    Return the plain text to build questions from and how many questions it warrants,
+    read from the note's precomputed `plain_text` and `word_count`.
+    """
+    if not note.plain_text and note.content:
+        # Not backfilled yet (see the backfill_plain_text command)
+        note.refresh_derived_text()
+
+    return note.plain_text, count_questions(note.word_count)
+
+
+def hash_content(plain_text_content):
+    return hashlib.sha256(plain_text_content.encode('utf-8')).hexdigest()
+
+
+def get_cached_questions(plain_text_content, num_questions, llm_model=DEFAULT_ENGINE):
+    questions = QuestionCache.objects.filter(
+        content_hash=hash_content(plain_text_content),
+        num_questions=num_questions,
+        llm_model=llm_model,
+    ).values_list('questions', flat=True).first()
+
+    # An empty entry is a miss, so the content is generated again
+    return questions or None
+
+
+def store_cached_questions(plain_text_content, num_questions, questions_data, llm_model=DEFAULT_ENGINE):
+    if not questions_data:
+        return
+
+    QuestionCache.objects.bulk_create([
+        QuestionCache(
+            content_hash=hash_content(plain_text_content),
+            num_questions=num_questions,
+            llm_model=llm_model,
+            questions=questions_data,
+        )
+    ], ignore_conflicts=True)
+
+
+def store_note_questions(note, plain_text_content, questions_data):
+    """
+    Store questions on the note unless its text changed after `plain_text_content` was read
+    from it. An edit clears the note's questions, and questions generated from the old text
+    must not be written back over that.
+
+    :return: Whether the note was updated.
+    """
+    if note.has_changed('plain_text'):
+        # get_question_params derived the text of a note that was not backfilled yet
+        unchanged = Q(plain_text='', content=note.content)
+    else:
+        unchanged = Q(plain_text=plain_text_content)
+
+    return LearningNote.objects.filter(unchanged, id=note.id).update(generated_questions=questions_data) > 0
+
+
+def lookup_cached_questions(note):
+    """
+    Return cached questions for the note's content, or None if the LLM has not seen it yet.
+    """
+    return get_cached_questions(*get_question_params(note))
+
+
+def generate_new_questions(note):
+    plain_text_content, num_questions = get_question_params(note)
+
+    cached_questions = get_cached_questions(plain_text_content, num_questions)
+    if cached_questions is not None:
+        return cached_questions
+
+    question_generator = QuestionGenerator()
+
+    questions_data = question_generator.generate_questions(plain_text_content, num_questions)
+
+    if "error" not in questions_data:
+        store_cached_questions(plain_text_content, num_questions, questions_data)
+
+    return questions_data
+
+
+def enqueue_question_job(note, user):
+    """
+    Queue question generation for a note, reusing a job that is already waiting or running.
+    """
+    active_job = QuestionGenerationJob.objects.filter(
+        note=note,
+        status__in=[QuestionGenerationJob.Status.PENDING, QuestionGenerationJob.Status.RUNNING]
+    ).first()
+
+    if active_job:
+        return active_job
+
+    return QuestionGenerationJob.objects.create(note=note, requested_by=user)
+
+
+def claim_next_job():
+    """
+    Claim the oldest runnable job with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+    workers can poll the table without handing the same job out twice.
+
+    Running jobs whose lease has expired (their worker died mid-call) are claimed again.
+    """
+    now = timezone.now()
+    lease_expired_at = now - timedelta(seconds=getattr(settings, 'QUESTION_JOB_LEASE_SECONDS', 300))
+
+    with transaction.atomic():
+        job = QuestionGenerationJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=QuestionGenerationJob.Status.PENDING) |
+            Q(status=QuestionGenerationJob.Status.RUNNING, started_at__lt=lease_expired_at)
+        ).order_by('created_at').first()
+
+        if job is None:
+            return None
+
+        job.status = QuestionGenerationJob.Status.RUNNING
+        job.started_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'started_at', 'attempts'])
+
+    return job
+
+
+def run_job(job):
+    """
+    Generate questions for a claimed job and store them on its note. Failed jobs go back
+    to the queue until QUESTION_JOB_MAX_ATTEMPTS is reached, and so do jobs whose note was
+    edited while the LLM ran, without using up an attempt.
+
+    :raises LLMUnavailableError: If OpenAI could not be called; the job is returned to the
+                                 queue without using up an attempt.
+    """
+    note = job.note
+    plain_text_content, _ = get_question_params(note)
+
+    try:
+        questions_data = generate_new_questions(note)
+    except LLMUnavailableError:
+        job.status = QuestionGenerationJob.Status.PENDING
+        job.attempts -= 1
+        job.save(update_fields=['status', 'attempts'])
+        raise
+
+    if "error" in questions_data:
+        job.error = questions_data["error"]
+        if job.attempts >= getattr(settings, 'QUESTION_JOB_MAX_ATTEMPTS', 3):
+            job.status = QuestionGenerationJob.Status.FAILED
+            job.finished_at = timezone.now()
+        else:
+            job.status = QuestionGenerationJob.Status.PENDING
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        return job
+
+    with transaction.atomic():
+        if not store_note_questions(note, plain_text_content, questions_data):
+            # The note was edited while the LLM ran: queue the job again for the new text
+            job.status = QuestionGenerationJob.Status.PENDING
+            job.attempts -= 1
+            job.save(update_fields=['status', 'attempts'])
+            return job
+
+        job.status = QuestionGenerationJob.Status.SUCCEEDED
+        job.error = ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+
+    bump_timeline_version(note.user_id)
+
+    return job
@@ -50,8 +50,125 @@ class LearningNoteSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = LearningNote
-        fields = ['id', 'user', 'title', 'content', 'created_at',
+        fields = ['id', 'user', 'title', 'content', 'excerpt', 'created_at',
                   'updated_at', 'archived', 'labels', 'collection']
+        read_only_fields = ['excerpt']
+
+
+def parse_fieldset(query_params, available_fields, default_fields=None):
+    """
+    Read a sparse fieldset from the comma-separated `fields=` or `exclude=` query parameter.
+
+    :param available_fields: Every field the endpoint can return, in output order.
+    :param default_fields: The fields returned when neither parameter is given (all of them
+                           if None); `exclude=` removes fields from this set.
+    :return: The selected fields, in output order.
+    :raises ValueError: If both parameters are given or a field is unknown.
+    """
+    fields = query_params.get('fields')
+    exclude = query_params.get('exclude')
+
+    if fields and exclude:
+        raise ValueError('Pass either fields or exclude, not both')
+
+    requested = [field.strip() for field in (fields or exclude or '').split(',') if field.strip()]
+    unknown = [field for field in requested if field not in available_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    selected = available_fields if default_fields is None else default_fields
+    if fields:
+        selected = requested
+    elif exclude:
+        selected = [field for field in selected if field not in requested]
+
+    return [field for field in available_fields if field in selected]
+
+
+class LearningNoteRowSerializer:
+    """
+    Read-only fast path producing the same output as `LearningNoteSerializer(many=True)`
+    from `values()` rows, for list endpoints.
+
+    The label ids of all rows are read with one query on the labels through table, instead
+    of one query per note, and rows are turned into dicts directly rather than through DRF
+    fields. Build the rows with `LearningNoteRowSerializer.values(queryset)`.
+
+    Both accept an optional sparse fieldset; columns outside it are never selected, except
+    the ones pagination and ETags rely on.
+    """
+    fields = ['id', 'user', 'title', 'content', 'excerpt', 'created_at', 'updated_at', 'archived', 'collection']
+    # Output keys, in the order LearningNoteSerializer uses
+    output_fields = ['id', 'user', 'title', 'content', 'excerpt', 'created_at', 'updated_at', 'archived',
+                     'labels', 'collection']
+    # Lists show the excerpt; the full content has to be asked for with fields=
+    default_fields = [field for field in output_fields if field != 'content']
+    # Always selected: cursors are built from (created_at, id) and ETags from (id, updated_at)
+    required_fields = {'id', 'created_at', 'updated_at'}
+    datetime_fields = {'created_at', 'updated_at'}
+
+    # Formats datetimes exactly like LearningNoteSerializer does
+    datetime_field = serializers.DateTimeField()
+
+    def __init__(self, rows, fields=None):
+        self.rows = rows
+        self.selected_fields = [field for field in self.output_fields if fields is None or field in fields]
+
+    @classmethod
+    def values(cls, queryset, fields=None):
+        return queryset.values(*[
+            field for field in cls.fields if fields is None or field in fields or field in cls.required_fields])
+
+    def get_label_ids(self):
+        note_labels = {row['id']: [] for row in self.rows}
+        label_rows = LearningNote.labels.through.objects.filter(
+            learningnote_id__in=note_labels).order_by('id').values_list('learningnote_id', 'label_id')
+        for note_id, label_id in label_rows:
+            note_labels[note_id].append(label_id)
+
+        return note_labels
+
+    @property
+    def data(self):
+        note_labels = self.get_label_ids() if self.rows and 'labels' in self.selected_fields else {}
+        to_representation = self.datetime_field.to_representation
+
+        data = []
+        for row in self.rows:
+            item = {}
+            for field in self.selected_fields:
+                if field == 'labels':
+                    item[field] = note_labels[row['id']]
+                elif field in self.datetime_fields:
+                    item[field] = to_representation(row[field])
+                else:
+                    item[field] = row[field]
+            data.append(item)
+
+        return data
+
+
+class BulkNoteSerializer(serializers.ModelSerializer):
+    """
+    Validates the note fields of a bulk create or update. Labels and collections are checked
+    for the whole batch at once by `bulk_operations.check_ownership`.
+    """
+    class Meta:
+        model = LearningNote
+        fields = ['title', 'content']
+
+
+class LearningNoteSearchResultSerializer(LearningNoteSerializer):
+    headline = serializers.CharField(read_only=True)
+
+    class Meta(LearningNoteSerializer.Meta):
+        fields = LearningNoteSerializer.Meta.fields + ['headline']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field in set(self.fields) - set(fields):
+                self.fields.pop(field)
 
 
 class CollectionSerializer(serializers.ModelSerializer):
@@ -0,0 +1,32 @@
+"""
+Minimal Django configuration for unit tests that import the app's models or read settings.
+None of these tests touch a database; the database tests live in learning_notes_app/tests.py
+and run with `python manage.py test`.
+"""
+import os
+import sys
+
+import django
+from django.conf import settings
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def setup():
+    if settings.configured:
+        return
+
+    sys.path.append(REPO_ROOT)
+    settings.configure(
+        SECRET_KEY='test',
+        USE_TZ=True,
+        DATABASES={},
+        INSTALLED_APPS=[
+            'django.contrib.contenttypes',
+            'django.contrib.auth',
+            'django.contrib.postgres',
+            'rest_framework',
+            'learning_notes_app',
+        ],
+    )
+    django.setup()
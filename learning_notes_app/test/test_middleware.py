@@ -0,0 +1,117 @@
+import gzip
+import unittest
+import zlib
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(__file__))
+import django_settings
+django_settings.setup()
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from middleware import CompressionMiddleware, GzipEncoder, choose_encoding, compress_stream, parse_accept_encoding
+
+SUPPORTED = ['zstd', 'br', 'gzip']
+
+
+class TestChooseEncoding(unittest.TestCase):
+
+    def test_parses_quality_values(self):
+        self.assertEqual(parse_accept_encoding("gzip;q=0.5, br"), {"gzip": 0.5, "br": 1.0})
+
+    def test_prefers_server_order_at_equal_quality(self):
+        self.assertEqual(choose_encoding("gzip, br, zstd", SUPPORTED), "zstd")
+
+    def test_respects_client_quality(self):
+        self.assertEqual(choose_encoding("gzip;q=1.0, br;q=0.2", SUPPORTED), "gzip")
+
+    def test_skips_unavailable_and_refused_codings(self):
+        self.assertEqual(choose_encoding("br, gzip;q=0", ["gzip"]), None)
+
+    def test_wildcard(self):
+        self.assertEqual(choose_encoding("*", ["gzip"]), "gzip")
+        self.assertEqual(choose_encoding("*, gzip;q=0", ["br", "gzip"]), "br")
+
+    def test_no_header(self):
+        self.assertIsNone(choose_encoding("", SUPPORTED))
+
+
+class TestCompressStream(unittest.TestCase):
+
+    def test_each_chunk_is_flushed(self):
+        stream = compress_stream(iter([b"event: question\n\n", b"event: done\n\n"]), GzipEncoder(6))
+
+        first = next(stream)
+        # The first event can be decoded before the stream ends
+        self.assertEqual(zlib.decompressobj(31).decompress(first), b"event: question\n\n")
+
+    def test_round_trip(self):
+        chunks = [b"line %d\n" % i for i in range(1000)]
+        body = b"".join(compress_stream(iter(chunks), GzipEncoder(6)))
+        self.assertEqual(gzip.decompress(body), b"".join(chunks))
+
+class TestCompressionMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.body = b'{"results": [' + b'{"title": "note"},' * 200 + b'{}]}'
+
+    def respond(self, response, accept_encoding="gzip"):
+        middleware = CompressionMiddleware(lambda request: response)
+        middleware.encoders = {"gzip": GzipEncoder}
+        return middleware(RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def json_response(self, body, **kwargs):
+        response = HttpResponse(body, content_type="application/json", **kwargs)
+        response["ETag"] = '"abc"'
+        return response
+
+    def test_compresses_and_weakens_etag(self):
+        response = self.respond(self.json_response(self.body))
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_small_responses_are_sent_as_is(self):
+        response = self.respond(self.json_response(b'{"ok": true}'))
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["ETag"], '"abc"')
+
+    def test_identity_when_not_accepted(self):
+        response = self.respond(self.json_response(self.body), accept_encoding="br")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, self.body)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_partial_content_is_not_compressed(self):
+        response = self.json_response(self.body, status=206)
+        response["Content-Range"] = "bytes 0-%d/5000" % (len(self.body) - 1)
+
+        response = self.respond(response)
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, self.body)
+
+    def test_not_modified_gets_weak_etag_and_vary(self):
+        response = self.respond(self.json_response(b"", status=304))
+
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_streaming_response_drops_content_length(self):
+        response = StreamingHttpResponse(iter([b"a\n", b"b\n"]), content_type="application/x-ndjson")
+        response["Content-Length"] = "4"
+
+        response = self.respond(response)
+
+        self.assertFalse(response.has_header("Content-Length"))
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), b"a\nb\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+import unittest
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(__file__))
+import django_settings
+django_settings.setup()
+from learning_notes_app.note_import import (
+    DEFAULT_LABEL_COLOR, _copy_batch, _parse_bool, _parse_labels, read_csv, read_ndjson, validate_record)
+
+class TestReaders(unittest.TestCase):
+
+    def test_read_ndjson_skips_blank_lines_and_reports_bad_ones(self):
+        stream = io.StringIO('{"title": "a"}\n\nnot json\n[1, 2]\n{"title": "b"}\n')
+
+        records = list(read_ndjson(stream))
+
+        self.assertEqual([line for line, _ in records], [1, 3, 4, 5])
+        self.assertEqual(records[0][1], {"title": "a"})
+        self.assertIsInstance(records[1][1], ValueError)
+        self.assertIsInstance(records[2][1], ValueError)
+        self.assertEqual(records[3][1], {"title": "b"})
+
+    def test_read_csv_splits_labels(self):
+        stream = io.StringIO('title,content,labels\nT,"multi\nline",a; b ;\nU,c,\n', newline='')
+
+        records = list(read_csv(stream))
+
+        self.assertEqual(records[0][1], {'title': 'T', 'content': 'multi\nline', 'labels': ['a', 'b']})
+        self.assertEqual(records[1][1]['labels'], [])
+        self.assertEqual(records[1][0], 4)
+
+class TestParseFields(unittest.TestCase):
+
+    def test_parse_bool(self):
+        self.assertTrue(_parse_bool(True))
+        self.assertTrue(_parse_bool(' Yes '))
+        self.assertFalse(_parse_bool('0'))
+        self.assertFalse(_parse_bool(None))
+        self.assertFalse(_parse_bool(''))
+        with self.assertRaises(ValueError):
+            _parse_bool('maybe')
+
+    def test_parse_labels_accepts_names_and_objects(self):
+        labels = _parse_labels([{"name": " x ", "color": "#fff"}, "y", "x"])
+
+        # The first occurrence of a name wins, so "x" keeps its color
+        self.assertEqual(labels, [{'name': 'x', 'color': '#fff'}, {'name': 'y', 'color': DEFAULT_LABEL_COLOR}])
+
+    def test_parse_labels_falls_back_to_default_color(self):
+        self.assertEqual(_parse_labels([{"name": "x", "color": "#123456789"}]),
+                         [{'name': 'x', 'color': DEFAULT_LABEL_COLOR}])
+
+    def test_parse_labels_rejects_invalid_values(self):
+        for value in ("a", [""], [{"color": "#fff"}], [1], ["x" * 101], ["a\x00b"]):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                _parse_labels(value)
+
+class TestValidateRecord(unittest.TestCase):
+
+    def test_derives_text_columns(self):
+        row = validate_record(3, {
+            "title": "T", "content": "<p>Hello <b>world</b></p>", "collection": {"name": " C "},
+            "created_at": "2024-01-01T10:00:00", "archived": True, "labels": ["a"]})
+
+        self.assertEqual(row.line, 3)
+        self.assertEqual(row.plain_text, "Hello world")
+        self.assertEqual(row.word_count, 2)
+        self.assertEqual(row.excerpt, "Hello world")
+        self.assertEqual(row.created_at, datetime(2024, 1, 1, 10, 0, tzinfo=timezone.utc))
+        self.assertTrue(row.archived)
+        self.assertEqual(row.collection_name, "C")
+
+    def test_collection_is_optional(self):
+        self.assertIsNone(validate_record(1, {"title": "T", "content": "c", "collection": None}).collection_name)
+        self.assertIsNone(validate_record(1, {"title": "T", "content": "c", "collection": " "}).collection_name)
+
+    def test_rejects_invalid_records(self):
+        for record in (
+            {"content": "c"},
+            {"title": " ", "content": "c"},
+            {"title": "x" * 256, "content": "c"},
+            {"title": "T"},
+            {"title": "T", "content": "c", "created_at": "yesterday"},
+            {"title": "T", "content": "c", "collection": 5},
+            {"title": "T", "content": "c", "collection": "x" * 51},
+            {"title": "T\x00", "content": "c"},
+            {"title": "T", "content": "c\x00"},
+            {"title": "T", "content": "c", "collection": "a\x00"},
+        ):
+            with self.subTest(record=record), self.assertRaises(ValueError):
+                validate_record(1, record)
+
+class RecordingCursor:
+    def copy_expert(self, sql, file):
+        self.sql = sql
+        self.payload = file.read()
+
+class TestCopyBatch(unittest.TestCase):
+
+    def test_payload_is_quoted_csv(self):
+        rows = [
+            validate_record(1, {"title": "\\N", "content": "<p></p>", "labels": [{"name": "q", "color": "#fff"}],
+                                "created_at": "2024-01-01T10:00:00Z"}),
+            validate_record(2, {"title": 'a "b", c', "content": "two\nlines", "collection": "C", "archived": "yes"}),
+        ]
+        cursor = RecordingCursor()
+
+        _copy_batch(cursor, rows)
+
+        self.assertIn("COPY learning_note_import (line, title, content,", cursor.sql)
+        self.assertIn("FROM STDIN WITH (FORMAT csv)", cursor.sql)
+
+        lines = cursor.payload.splitlines(keepends=True)
+        self.assertEqual(
+            lines[0],
+            '1,"\\N","<p></p>","",0,"","2024-01-01T10:00:00+00:00","f","","[{""name"": ""q"", ""color"": ""#fff""}]"\r\n')
+
+        first, second = csv.reader(io.StringIO(cursor.payload, newline=''))
+        self.assertEqual(second[1:4], ['a "b", c', 'two\nlines', 'two lines'])
+        self.assertEqual(second[7:9], ['t', 'C'])
+        self.assertEqual(json.loads(first[9]), [{"name": "q", "color": "#fff"}])
@@ -1,9 +1,15 @@
 import unittest
 import os
 import sys
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+import openai
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from question_generator import QuestionGenerator
+from question_generator import CircuitBreaker, LLMUnavailableError, QuestionGenerator, QuestionStreamParser
 
 class TestQuestionGenerator(unittest.TestCase):
     def setUp(self):
@@ -32,6 +38,146 @@ class TestQuestionGenerator(unittest.TestCase):
                      'answer': 'B) When old data needs to be fetched only once.'}]
         self.assertEqual(parsed_questions, expected)
 
+    def test_parse_questions_skips_malformed_and_empty_sections(self):
+        response = '<Question>: Q1?\n<Options>:\nA) a\nB) b\n<Answer>: A) a\n---\n<Question>: no answer here\nA) a\n---\n  <Question>: Q3?\n  A) x\n  <Answer>: A) x\n---\n'
+        parsed_questions = self.generator._parse_questions(response)
+
+        self.assertEqual(parsed_questions, [
+            {'question': 'Q1?', 'options': ['A) a', 'B) b'], 'answer': 'A) a'},
+            {'question': 'Q3?', 'options': ['A) x'], 'answer': 'A) x'},
+        ])
+
+class TestStructuredOutput(unittest.TestCase):
+    def test_json_mode_requests_schema_and_parses_response(self):
+        client = StubClient('{"questions": [{"question": "Q?", "options": ["A) a", "B) b"], "answer": "A) a"}, {"question": "broken"}]}')
+        generator = QuestionGenerator(client=client, output_format="json")
+
+        questions = generator.generate_questions("Some content", 2)
+
+        self.assertEqual(questions, [{'question': 'Q?', 'options': ['A) a', 'B) b'], 'answer': 'A) a'}])
+        self.assertEqual(client.requests[0]["response_format"]["type"], "json_schema")
+
+class StubClient:
+    """Mimics client.chat.completions.create() and returns a canned completion."""
+    def __init__(self, content):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.content = content
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+class TestQuestionGeneratorWithStubClient(unittest.TestCase):
+    def test_generate_questions_uses_injected_client(self):
+        client = StubClient('<Question>: Q?\n<Options>:\nA) a\nB) b\nC) c\nD) d\n<Answer>: B) b')
+        generator = QuestionGenerator(client=client)
+
+        questions = generator.generate_questions("Some content", 1)
+
+        self.assertEqual(questions, [{'question': 'Q?',
+                                      'options': ['A) a', 'B) b', 'C) c', 'D) d'],
+                                      'answer': 'B) b'}])
+        self.assertEqual(len(client.requests), 1)
+        self.assertIn("Some content", client.requests[0]["messages"][0]["content"])
+
+    def test_completion_without_questions_is_an_error(self):
+        generator = QuestionGenerator(client=StubClient('<Question>: no answer\nA) a\n---\n'))
+
+        self.assertEqual(generator.generate_questions("Some content", 1),
+                         {"error": "No questions could be parsed from the completion"})
+
+class FailingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_threshold_and_allows_one_trial_after_reset(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow_request())
+
+        clock.now = 10
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow_request())
+
+    def test_failed_trial_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+
+        breaker.record_failure()
+        clock.now = 10
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+
+        self.assertFalse(breaker.allow_request())
+
+class TestQuestionGeneratorGuards(unittest.TestCase):
+    def test_fails_fast_once_circuit_opens(self):
+        client = FailingClient()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        generator = QuestionGenerator(client=client, circuit_breaker=breaker,
+                                      request_slots=threading.BoundedSemaphore(1))
+
+        self.assertIn("error", generator.generate_questions("content", 1))
+        self.assertIn("error", generator.generate_questions("content", 1))
+        with self.assertRaises(LLMUnavailableError):
+            generator.generate_questions("content", 1)
+        self.assertEqual(client.calls, 2)
+
+    def test_refuses_when_no_request_slot_is_free(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        generator = QuestionGenerator(client=StubClient(""), circuit_breaker=CircuitBreaker(),
+                                      request_slots=slots)
+
+        with mock.patch("question_generator.LLM_SLOT_TIMEOUT", 0.01), \
+                self.assertRaises(LLMUnavailableError):
+            generator.generate_questions("content", 1)
+
+class TestQuestionStreamParser(unittest.TestCase):
+    def test_emits_each_question_once_its_section_closes(self):
+        text = '<Question>: Q1?\n<Options>:\nA) a\nB) b\nC) c\nD) d\n<Answer>: A) a\n---\n<Question>: Q2?\n<Options>:\nA) a\nB) b\nC) c\nD) d\n<Answer>: D) d\n'
+        parser = QuestionStreamParser()
+
+        emitted = []
+        for i in range(0, len(text), 5):
+            emitted.append([q['question'] for q in parser.feed(text[i:i + 5])])
+        closing = [q['question'] for q in parser.close()]
+
+        flat = [question for chunk in emitted for question in chunk]
+        self.assertEqual(flat, ['Q1?'])
+        self.assertEqual(closing, ['Q2?'])
+
+    def test_ignores_empty_trailing_section(self):
+        parser = QuestionStreamParser()
+        questions = parser.feed('<Question>: Q?\n<Options>:\nA) a\n<Answer>: A) a\n---\n')
+
+        self.assertEqual(len(questions), 1)
+        self.assertEqual(parser.close(), [])
+
 # Run the test
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from django.core.cache.backends.locmem import LocMemCache
+from timeline_cache import TimelineCache
+
+class TestTimelineCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = TimelineCache(LocMemCache('timeline-test', {}), timeout=60)
+        self.params = {'collection_id': 0, 'labels': [1, 2], 'page': '2'}
+
+    def test_miss_then_hit(self):
+        key = self.cache.make_key(1, self.params)
+        self.assertIsNone(self.cache.get(key))
+
+        self.cache.set(key, {'results': []})
+        self.assertEqual(self.cache.get(key), {'results': []})
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_bump_version_invalidates_only_that_user(self):
+        key = self.cache.make_key(1, self.params)
+        other_key = self.cache.make_key(2, self.params)
+        self.cache.set(key, {'results': [1]})
+        self.cache.set(other_key, {'results': [2]})
+
+        self.cache.bump_version(1)
+
+        self.assertNotEqual(self.cache.make_key(1, self.params), key)
+        self.assertEqual(self.cache.make_key(2, self.params), other_key)
+        self.assertIsNone(self.cache.get(self.cache.make_key(1, self.params)))
+
+    def test_bump_version_without_existing_version(self):
+        self.cache.bump_version(3)
+        self.assertIsNotNone(self.cache.get_version(3))
+
+    def test_key_ignores_param_order(self):
+        reordered = dict(reversed(list(self.params.items())))
+        self.assertEqual(self.cache.make_key(1, self.params), self.cache.make_key(1, reordered))
+
+if __name__ == "__main__":
+    unittest.main()
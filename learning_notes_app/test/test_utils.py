@@ -3,7 +3,8 @@ import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils import extract_text_from_html
+from utils import (
+    RateLimiter, decode_cursor, encode_cursor, extract_text_from_html, make_excerpt, reciprocal_rank_fusion)
 
 class TestExtractTextFromHtml(unittest.TestCase):
 
@@ -43,5 +44,100 @@ class TestExtractTextFromHtml(unittest.TestCase):
         result = extract_text_from_html(html_content)
         self.assertEqual(result, expected_output)
 
+class TestExtractTextSkipsNonContent(unittest.TestCase):
+
+    def test_skips_scripts_styles_and_comments(self):
+        html_content = "<style>p { color: red; }</style><p>Shown<!-- hidden --> text</p><script>alert(1)</script>"
+        self.assertEqual(extract_text_from_html(html_content), "Shown text")
+
+    def test_decodes_entities(self):
+        self.assertEqual(extract_text_from_html("<p>a &amp; b &lt;c&gt;</p>"), "a & b <c>")
+
+class TestMakeExcerpt(unittest.TestCase):
+
+    def test_short_text_is_unchanged(self):
+        self.assertEqual(make_excerpt("A short note.", max_length=20), "A short note.")
+
+    def test_cuts_at_word_boundary(self):
+        result = make_excerpt("one two three four five six", max_length=16)
+        self.assertEqual(result, "one two three…")
+        self.assertLessEqual(len(result), 16)
+
+    def test_cuts_long_words_mid_word(self):
+        result = make_excerpt("x" * 50, max_length=10)
+        self.assertEqual(result, "x" * 9 + "…")
+
+
+class TestCursorEncoding(unittest.TestCase):
+
+    def test_round_trip(self):
+        position = {"created_at": "2024-12-19T10:30:00.123456+00:00", "id": 42}
+        token = encode_cursor(position)
+        self.assertNotIn("=", token)
+        self.assertEqual(decode_cursor(token), position)
+
+    def test_decode_rejects_garbage(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_decode_rejects_non_object_payload(self):
+        with self.assertRaises(ValueError):
+            decode_cursor(encode_cursor([1, 2, 3]))
+
+class TestReciprocalRankFusion(unittest.TestCase):
+
+    def test_items_in_both_rankings_come_first(self):
+        result = reciprocal_rank_fusion([1, 2, 3], [4, 3, 5])
+        self.assertEqual(result[0], 3)
+
+    def test_single_ranking_keeps_its_order(self):
+        self.assertEqual(reciprocal_rank_fusion([7, 8, 9]), [7, 8, 9])
+
+    def test_empty_rankings(self):
+        self.assertEqual(reciprocal_rank_fusion([], []), [])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_spaces_requests_evenly(self):
+        clock = FakeClock()
+        limiter = RateLimiter(120, clock=clock, sleep=clock.sleep)
+
+        for _ in range(3):
+            limiter.acquire()
+
+        self.assertEqual(clock.sleeps, [0.5, 0.5])
+
+    def test_does_not_sleep_when_calls_are_already_spaced(self):
+        clock = FakeClock()
+        limiter = RateLimiter(60, clock=clock, sleep=clock.sleep)
+
+        limiter.acquire()
+        clock.now += 5
+        limiter.acquire()
+
+        self.assertEqual(clock.sleeps, [])
+
+    def test_zero_disables_the_limit(self):
+        clock = FakeClock()
+        limiter = RateLimiter(0, clock=clock, sleep=clock.sleep)
+
+        for _ in range(5):
+            limiter.acquire()
+
+        self.assertEqual(clock.sleeps, [])
+
 if __name__ == '__main__':
     unittest.main()
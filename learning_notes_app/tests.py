@@ -1,3 +1,841 @@
-from django.test import TestCase
+import io
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVector
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from . import collection_service, question_service
+from .learning_note_pagination import LearningNoteCursorPagination
+from .models import Collection, CollectionArchiveJob, Label, LearningNote
+from .note_export import export_ndjson, serialize_export_note
+from .note_import import import_notes, read_ndjson
+from .search_service import typeahead_search
+
+# These tests need PostgreSQL (COPY, jsonb, search vectors): run them with
+# `python manage.py test learning_notes_app` against a database the user may create.
+
+
+def make_user(email):
+    return User.objects.create(username=email, email=email)
+
+
+def export_documents(ndjson):
+    documents = [json.loads(line) for line in ndjson.splitlines()]
+    for document in documents:
+        del document['id'], document['updated_at']
+
+    return sorted(documents, key=lambda document: document['title'])
+
+
+class NoteExportTests(TestCase):
+    def setUp(self):
+        self.user = make_user('exporter@example.com')
+
+    def test_serialized_note_shapes(self):
+        collection = Collection.objects.create(name='Physics', created_by=self.user)
+        label = Label.objects.create(name='waves', color='#0000ff', created_by=self.user)
+        note = LearningNote.objects.create(user=self.user, title='Waves', content='<p>w</p>', collection=collection)
+        note.labels.add(label)
+        loose = LearningNote.objects.create(user=self.user, title='Loose', content='<p>l</p>')
+
+        self.assertEqual(serialize_export_note(note)['collection'], {'id': collection.id, 'name': 'Physics'})
+        self.assertEqual(serialize_export_note(note)['labels'],
+                         [{'id': label.id, 'name': 'waves', 'color': '#0000ff'}])
+        self.assertIsNone(serialize_export_note(loose)['collection'])
+        self.assertEqual(serialize_export_note(loose)['labels'], [])
+
+    def test_ndjson_blocks(self):
+        LearningNote.objects.bulk_create([
+            LearningNote(user=self.user, title=f'Note {i}', content='x') for i in range(5)])
+        LearningNote.objects.create(user=make_user('someone@example.com'), title='Not mine', content='x')
+
+        blocks = list(export_ndjson(self.user, chunk_size=2))
+
+        # Full blocks of chunk_size lines, then the rest, each ending with a newline
+        self.assertEqual([block.count(b'\n') for block in blocks], [2, 2, 1])
+        self.assertTrue(all(block.endswith(b'\n') for block in blocks))
+        documents = [json.loads(line) for line in b''.join(blocks).splitlines()]
+        self.assertEqual([document['title'] for document in documents], [f'Note {i}' for i in range(5)])
+        self.assertTrue(documents[0]['created_at'].endswith('Z'))
+        self.assertIsNone(documents[0]['collection'])
+        self.assertEqual(documents[0]['labels'], [])
+
+    def test_empty_export(self):
+        self.assertEqual(list(export_ndjson(self.user)), [])
+
+
+class NoteImportTests(TestCase):
+    def setUp(self):
+        self.user = make_user('importer@example.com')
+
+    def ndjson(self, *records):
+        return read_ndjson(io.StringIO(''.join(json.dumps(record) + '\n' for record in records)))
+
+    def test_import_resolves_collections_and_labels(self):
+        Collection.objects.create(name='Existing', created_by=self.user)
+        Label.objects.create(name='taken', color='#000000', created_by=make_user('other@example.com'))
+
+        result = import_notes(self.user, self.ndjson(
+            {"title": "Alpha", "content": "<p>Photosynthesis converts light</p>", "archived": True,
+             "created_at": "2024-01-01T10:00:00Z", "collection": {"name": "Existing"},
+             "labels": [{"name": "bio", "color": "#00ff00"}, "taken"]},
+            {"title": "Beta", "content": "<p>Second</p>", "collection": "Fresh", "labels": ["bio", "new"]},
+            {"title": "Gamma", "content": "nul\u0000byte"},
+            {"title": "Delta"},
+        ), batch_size=1)
+
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(result['invalid'], 2)
+        self.assertEqual([error['line'] for error in result['errors']], [3, 4])
+        self.assertEqual(result['unresolved_labels'], ['taken'])
+
+        alpha, beta = LearningNote.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(alpha.collection.name, 'Existing')
+        self.assertTrue(alpha.archived)
+        self.assertEqual([label.name for label in alpha.labels.all()], ['bio'])
+        self.assertEqual(alpha.plain_text, 'Photosynthesis converts light')
+        self.assertIn("'photosynthesi':2B", alpha.search_vector)
+        self.assertEqual(beta.collection.name, 'Fresh')
+        self.assertEqual(sorted(label.name for label in beta.labels.all()), ['bio', 'new'])
+        self.assertEqual(Label.objects.get(name='bio').color, '#00ff00')
+        self.assertEqual(Collection.objects.filter(created_by=self.user).count(), 2)
+
+        # Ids come from the table's own sequence, so ORM inserts carry on after them
+        note = LearningNote.objects.create(user=self.user, title='After', content='<p>after</p>')
+        self.assertGreater(note.id, beta.id)
+
+    def test_import_can_run_twice_in_one_transaction(self):
+        import_notes(self.user, self.ndjson({"title": "One", "content": "one"}))
+        import_notes(self.user, self.ndjson({"title": "Two", "content": "two"}))
+
+        self.assertEqual(LearningNote.objects.filter(user=self.user).count(), 2)
+
+    def test_export_round_trips_through_import(self):
+        collection = Collection.objects.create(name='Biology', created_by=self.user)
+        label = Label.objects.create(name='cells', color='#123456', created_by=self.user)
+        note = LearningNote.objects.create(
+            user=self.user, title='Cells', content='<p>Cells divide</p>', collection=collection, archived=True)
+        note.labels.add(label)
+        LearningNote.objects.create(user=self.user, title='Loose', content='<p>No collection</p>')
+
+        exported = b''.join(export_ndjson(self.user)).decode()
+        LearningNote.objects.filter(user=self.user).delete()
+
+        result = import_notes(self.user, read_ndjson(io.StringIO(exported)))
+
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(result['errors'], [])
+        # Everything but the note ids and update times survives the round trip
+        self.assertEqual(export_documents(b''.join(export_ndjson(self.user))), export_documents(exported.encode()))
+
+    def test_import_endpoint_reads_csv_uploads(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        upload = SimpleUploadedFile(
+            'notes.csv', '\ufefftitle,content,labels,collection\nT,<b>text</b>,a;b,C\n'.encode(),
+            content_type='text/csv')
+
+        response = client.post('/api/learning_notes/import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['imported'], 1)
+        note = LearningNote.objects.get(user=self.user)
+        self.assertEqual((note.title, note.plain_text, note.collection.name), ('T', 'text', 'C'))
+        self.assertEqual(sorted(label.name for label in note.labels.all()), ['a', 'b'])
+
+
+@override_settings(COLLECTION_ARCHIVE_BATCH_SIZE=2, COLLECTION_ARCHIVE_INLINE_LIMIT=10)
+class CollectionArchiveTests(TestCase):
+    def setUp(self):
+        self.user = make_user('archiver@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.collection = Collection.objects.create(name='Big', created_by=self.user)
+        self.notes = LearningNote.objects.bulk_create([
+            LearningNote(user=self.user, title=f'Note {i}', content='x', collection=self.collection)
+            for i in range(5)])
+        self.loose_note = LearningNote.objects.create(user=self.user, title='Loose', content='x')
+        # Backdate the notes so a new updated_at is visible
+        self.long_ago = timezone.now() - timedelta(days=1)
+        LearningNote.objects.update(updated_at=self.long_ago)
+
+    def archived_notes(self):
+        return LearningNote.objects.filter(collection=self.collection, archived=True)
+
+    def test_small_collection_is_archived_inline(self):
+        response = self.client.post(f'/api/collection/{self.collection.id}/archive/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'succeeded')
+        self.assertEqual((response.json()['total'], response.json()['processed']), (5, 5))
+        self.assertEqual(self.archived_notes().count(), 5)
+        self.assertFalse(self.archived_notes().filter(updated_at__lte=self.long_ago).exists())
+        self.assertTrue(Collection.objects.get(id=self.collection.id).is_archived)
+
+        self.loose_note.refresh_from_db()
+        self.assertFalse(self.loose_note.archived)
+        self.assertEqual(self.loose_note.updated_at, self.long_ago)
+
+    def test_archiving_changes_the_collection_etag(self):
+        etag = self.client.get(f'/api/collection/{self.collection.id}/')['ETag']
+
+        self.client.post(f'/api/collection/{self.collection.id}/archive/')
+
+        response = self.client.get(f'/api/collection/{self.collection.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unarchive(self):
+        self.client.post(f'/api/collection/{self.collection.id}/archive/')
+
+        response = self.client.post(f'/api/collection/{self.collection.id}/unarchive/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['action'], 'unarchive')
+        self.assertFalse(self.archived_notes().exists())
+        self.assertFalse(Collection.objects.get(id=self.collection.id).is_archived)
+
+    @override_settings(COLLECTION_ARCHIVE_INLINE_LIMIT=4)
+    def test_large_collection_is_left_to_the_worker(self):
+        response = self.client.post(f'/api/collection/{self.collection.id}/archive/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertFalse(self.archived_notes().exists())
+        # The collection itself is flagged straight away
+        self.assertTrue(Collection.objects.get(id=self.collection.id).is_archived)
+
+        # The worker closes connections between jobs, which would end the test's transaction
+        with mock.patch('learning_notes_app.management.commands.process_collection_archive_jobs.'
+                        'close_old_connections'):
+            call_command('process_collection_archive_jobs', '--once', stdout=io.StringIO())
+
+        status = self.client.get(f"/api/collection/archive-jobs/{response.json()['job_id']}/").json()
+        self.assertEqual((status['status'], status['processed'], status['total']), ('succeeded', 5, 5))
+        self.assertEqual(self.archived_notes().count(), 5)
+
+    @override_settings(COLLECTION_ARCHIVE_INLINE_LIMIT=0)
+    def test_opposite_action_conflicts_with_an_active_job(self):
+        job_id = self.client.post(f'/api/collection/{self.collection.id}/archive/').json()['job_id']
+
+        self.assertEqual(self.client.post(f'/api/collection/{self.collection.id}/unarchive/').status_code, 409)
+        # Asking for the same action again returns the active job
+        self.assertEqual(self.client.post(f'/api/collection/{self.collection.id}/archive/').json()['job_id'], job_id)
+
+    def test_inline_job_cannot_be_claimed_by_a_worker(self):
+        claimed = []
+
+        def run_job(job):
+            claimed.append(collection_service.claim_next_job())
+            return job
+
+        with mock.patch.object(collection_service, 'run_job', side_effect=run_job):
+            job = collection_service.start_archive_job(
+                self.collection, self.user, CollectionArchiveJob.Action.ARCHIVE)
+
+        self.assertEqual(job.status, CollectionArchiveJob.Status.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(claimed, [None])
+
+    @override_settings(COLLECTION_ARCHIVE_INLINE_LIMIT=0)
+    def test_failed_job_resumes_from_its_checkpoint(self):
+        archive_notes_batch = Collection.archive_notes_batch
+        calls = []
+
+        def failing_second_batch(collection, archived, after_id, batch_size):
+            calls.append(after_id)
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return archive_notes_batch(collection, archived, after_id, batch_size)
+
+        collection_service.start_archive_job(self.collection, self.user, CollectionArchiveJob.Action.ARCHIVE)
+
+        with mock.patch.object(Collection, 'archive_notes_batch', failing_second_batch):
+            job = collection_service.run_job(collection_service.claim_next_job())
+
+        self.assertEqual(job.status, CollectionArchiveJob.Status.PENDING)
+        self.assertEqual(job.error, 'connection lost')
+        self.assertEqual((job.processed, job.last_note_id), (2, self.notes[1].id))
+        self.assertEqual(self.archived_notes().count(), 2)
+
+        with mock.patch.object(Collection, 'archive_notes_batch', failing_second_batch):
+            job = collection_service.run_job(collection_service.claim_next_job())
+
+        self.assertEqual(job.status, CollectionArchiveJob.Status.SUCCEEDED)
+        self.assertEqual((job.processed, job.attempts), (5, 2))
+        # Batches of two, and the retry starts after the last note of the committed batch
+        self.assertEqual(calls, [0, self.notes[1].id, self.notes[1].id, self.notes[3].id, self.notes[4].id])
+        self.assertEqual(self.archived_notes().count(), 5)
+
+    def test_job_status_is_private(self):
+        job_id = self.client.post(f'/api/collection/{self.collection.id}/archive/').json()['job_id']
+        other = APIClient()
+        other.force_authenticate(make_user('someone@example.com'))
+
+        self.assertEqual(other.get(f'/api/collection/archive-jobs/{job_id}/').status_code, 404)
+        self.assertEqual(other.post(f'/api/collection/{self.collection.id}/unarchive/').status_code, 404)
+
+
+class BulkOperationsTests(TestCase):
+    def setUp(self):
+        self.user = make_user('bulk@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.collection = Collection.objects.create(name='Biology', created_by=self.user)
+        self.label = Label.objects.create(name='exam', color='#fff', created_by=self.user)
+        self.note = LearningNote.objects.create(
+            user=self.user, title='Cell', content='<p>ribosome</p>', collection=self.collection)
+
+        self.other = make_user('other-bulk@example.com')
+        self.other_note = LearningNote.objects.create(user=self.other, title='Theirs', content='x')
+        self.other_label = Label.objects.create(name='theirs', color='#000', created_by=self.other)
+        self.other_collection = Collection.objects.create(name='Theirs', created_by=self.other)
+
+    def bulk(self, *operations):
+        return self.client.post('/api/learning_notes/bulk/', {'operations': list(operations)}, format='json')
+
+    def test_applies_operations_in_order(self):
+        response = self.bulk(
+            {'op': 'create', 'title': 'New', 'content': '<p>mitosis</p>', 'labels': [self.label.id],
+             'collection_id': self.collection.id},
+            {'op': 'archive', 'ids': [self.note.id]},
+            {'op': 'move', 'ids': [self.note.id], 'collection_id': None},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['ok'] * 3)
+        created = LearningNote.objects.get(id=results[0]['id'])
+        self.assertEqual((created.plain_text, created.collection_id), ('mitosis', self.collection.id))
+        self.assertEqual(list(created.labels.all()), [self.label])
+        self.note.refresh_from_db()
+        self.assertTrue(self.note.archived)
+        self.assertIsNone(self.note.collection_id)
+
+    def test_update_keeps_changes_made_earlier_in_the_batch(self):
+        # The note to update is loaded before the archive runs
+        response = self.bulk(
+            {'op': 'archive', 'ids': [self.note.id]},
+            {'op': 'update', 'id': self.note.id, 'title': 'Cells', 'labels': [self.label.id]},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.title, 'Cells')
+        self.assertTrue(self.note.archived)
+        self.assertEqual(self.note.collection_id, self.collection.id)
+        self.assertEqual(list(self.note.labels.all()), [self.label])
+
+    def test_add_label_is_idempotent(self):
+        self.note.labels.add(self.label)
+
+        response = self.bulk(
+            {'op': 'add_label', 'ids': [self.note.id], 'label_id': self.label.id},
+            {'op': 'add_label', 'ids': [self.note.id], 'label_id': self.label.id},
+        )
+
+        self.assertEqual([result['updated'] for result in response.json()['results']], [1, 1])
+        self.assertEqual(LearningNote.labels.through.objects.filter(learningnote=self.note).count(), 1)
+
+        self.bulk({'op': 'remove_label', 'ids': [self.note.id], 'label_id': self.label.id})
+        self.assertFalse(self.note.labels.exists())
+
+    def test_invalid_operation_skips_the_whole_batch(self):
+        response = self.bulk(
+            {'op': 'archive', 'ids': [self.note.id]},
+            {'op': 'update'},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['skipped', 'error'])
+        self.note.refresh_from_db()
+        self.assertFalse(self.note.archived)
+
+    def test_other_users_objects_are_rejected_per_item(self):
+        response = self.bulk(
+            {'op': 'archive', 'ids': [self.note.id]},
+            {'op': 'archive', 'ids': [self.note.id, self.other_note.id]},
+            {'op': 'add_label', 'ids': [self.note.id], 'label_id': self.other_label.id},
+            {'op': 'move', 'ids': [self.note.id], 'collection_id': self.other_collection.id},
+            {'op': 'create', 'title': 'New', 'content': 'x', 'labels': [self.other_label.id]},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['skipped'] + ['error'] * 4)
+        self.assertEqual(results[1]['error'], f'Learning notes not found: [{self.other_note.id}]')
+        self.assertEqual(results[2]['error'], f'Invalid labels: [{self.other_label.id}]')
+        self.assertEqual(results[3]['error'], 'Collection not found')
+        self.assertEqual(results[4]['error'], f'Invalid labels: [{self.other_label.id}]')
+        self.note.refresh_from_db()
+        self.assertFalse(self.note.archived)
+        self.assertFalse(LearningNote.objects.filter(title='New').exists())
+
+    def test_failure_while_applying_rolls_back_the_batch(self):
+        with mock.patch('learning_notes_app.bulk_operations._update_note', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.bulk(
+                {'op': 'create', 'title': 'New', 'content': 'x'},
+                {'op': 'archive', 'ids': [self.note.id]},
+                {'op': 'update', 'id': self.note.id, 'title': 'Cells'},
+            )
+
+        self.assertFalse(LearningNote.objects.filter(title='New').exists())
+        self.note.refresh_from_db()
+        self.assertFalse(self.note.archived)
+
+
+class LearningNoteSaveTests(TestCase):
+    def setUp(self):
+        self.user = make_user('saver@example.com')
+        self.note = LearningNote.objects.create(
+            user=self.user, title='Cell', content='<p>The <b>ribosome</b></p>',
+            generated_questions=[{"question": "?"}])
+
+    def test_editing_content_clears_questions_and_recomputes_text(self):
+        note = LearningNote.objects.get(id=self.note.id)
+        note.content = '<p>The <i>nucleus</i> holds DNA</p>'
+        note.save()
+
+        note.refresh_from_db()
+        self.assertIsNone(note.generated_questions)
+        self.assertEqual((note.plain_text, note.word_count, note.excerpt),
+                         ('The nucleus holds DNA', 4, 'The nucleus holds DNA'))
+
+    def test_editing_content_with_update_fields_clears_questions(self):
+        note = LearningNote.objects.only('id', 'content').get(id=self.note.id)
+        note.content = '<p>Nucleus</p>'
+        note.save(update_fields=['content'])
+
+        note = LearningNote.objects.get(id=self.note.id)
+        self.assertIsNone(note.generated_questions)
+        self.assertEqual(note.plain_text, 'Nucleus')
+
+    def test_saves_that_leave_content_alone_keep_questions(self):
+        saves = {
+            'title': ({'title': 'Cells'}, None),
+            'archive': ({'archived': True}, None),
+            'questions only': ({}, ['generated_questions']),
+            'content assigned but not saved': ({'content': '<p>Other</p>'}, ['title']),
+        }
+        for name, (changes, update_fields) in saves.items():
+            with self.subTest(name):
+                LearningNote.objects.filter(id=self.note.id).update(generated_questions=[{"question": "?"}])
+                note = LearningNote.objects.get(id=self.note.id)
+                for field, value in changes.items():
+                    setattr(note, field, value)
+
+                note.save(update_fields=update_fields)
+
+                note = LearningNote.objects.get(id=self.note.id)
+                self.assertEqual(note.generated_questions, [{"question": "?"}])
+                self.assertEqual((note.plain_text, note.excerpt), ('The ribosome', 'The ribosome'))
+
+    def test_deferred_content_is_not_treated_as_changed(self):
+        note = LearningNote.objects.defer('content').get(id=self.note.id)
+        note.title = 'Cells'
+
+        with self.assertNumQueries(1):
+            note.save()
+
+        note = LearningNote.objects.get(id=self.note.id)
+        self.assertEqual(note.generated_questions, [{"question": "?"}])
+
+    def test_saving_a_note_without_plain_text_derives_it(self):
+        # A row from before plain_text existed; the trigger rebuilds its vector without a body
+        LearningNote.objects.filter(id=self.note.id).update(plain_text='', word_count=0, excerpt='')
+        note = LearningNote.objects.get(id=self.note.id)
+        self.assertNotIn('ribosom', note.search_vector)
+
+        note.title = 'Cells'
+        note.save()
+
+        note.refresh_from_db()
+        self.assertEqual((note.plain_text, note.word_count, note.excerpt), ('The ribosome', 2, 'The ribosome'))
+        self.assertIn("'ribosom':3B", note.search_vector)
+        self.assertEqual(note.generated_questions, [{"question": "?"}])
+
+
+class ReindexSearchVectorsTests(TestCase):
+    def setUp(self):
+        self.user = make_user('reindex@example.com')
+
+    def test_notes_without_plain_text_are_skipped(self):
+        backfilled = LearningNote.objects.create(user=self.user, title='Kept', content='<p>mitochondria</p>')
+        pending = LearningNote.objects.create(user=self.user, title='Pending', content='<p>ribosome</p>')
+        # A row from before plain_text existed, with the vector the old trigger built from the
+        # raw content, and a stale vector on a backfilled row
+        LearningNote.objects.filter(id=pending.id).update(plain_text='')
+        LearningNote.objects.filter(id=pending.id).update(search_vector=SearchVector('title', 'content'))
+        LearningNote.objects.filter(id=backfilled.id).update(search_vector=None)
+
+        output = io.StringIO()
+        call_command('reindex_search_vectors', '--batch-size', '1', stdout=output)
+
+        backfilled.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertIn("'mitochondria':2B", backfilled.search_vector)
+        self.assertIn("'ribosom'", pending.search_vector)
+        self.assertIn('Skipped 1 note(s) without plain text', output.getvalue())
+        self.assertIn('1 search vector(s) rebuilt', output.getvalue())
+
+
+class StubQuestionGenerator:
+    def __init__(self):
+        self.calls = []
+
+    def generate_questions(self, plain_text_content, num_questions):
+        self.calls.append(plain_text_content)
+        if 'fail' in plain_text_content:
+            return {"error": "LLM unavailable"}
+        return [{"question": f"What about {plain_text_content}?", "answer": plain_text_content}]
+
+
+class QuestionJobTests(TestCase):
+    def setUp(self):
+        self.user = make_user('jobs@example.com')
+        self.note = LearningNote.objects.create(user=self.user, title='Cell', content='<p>ribosome</p>')
+        self.generator = StubQuestionGenerator()
+
+    def run_job(self):
+        question_service.enqueue_question_job(self.note, self.user)
+        with mock.patch.object(question_service, 'QuestionGenerator', return_value=self.generator):
+            return question_service.run_job(question_service.claim_next_job())
+
+    def test_stores_questions_on_the_note(self):
+        job = self.run_job()
+
+        self.assertEqual(job.status, 'succeeded')
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.generated_questions[0]['answer'], 'ribosome')
+
+    def test_note_edited_during_generation_is_queued_again(self):
+        generate_questions = self.generator.generate_questions
+
+        def edit_then_generate(plain_text_content, num_questions):
+            note = LearningNote.objects.get(id=self.note.id)
+            note.content = '<p>nucleus</p>'
+            note.save()
+            return generate_questions(plain_text_content, num_questions)
+
+        self.generator.generate_questions = edit_then_generate
+
+        job = self.run_job()
+
+        self.assertEqual((job.status, job.attempts), ('pending', 0))
+        self.note.refresh_from_db()
+        self.assertIsNone(self.note.generated_questions)
+
+        self.generator.generate_questions = generate_questions
+        with mock.patch.object(question_service, 'QuestionGenerator', return_value=self.generator):
+            job = question_service.run_job(question_service.claim_next_job())
+
+        self.assertEqual(job.status, 'succeeded')
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.generated_questions[0]['answer'], 'nucleus')
+
+    def test_note_not_backfilled_gets_questions(self):
+        LearningNote.objects.filter(id=self.note.id).update(plain_text='', word_count=0)
+
+        job = self.run_job()
+
+        self.assertEqual(job.status, 'succeeded')
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.generated_questions[0]['answer'], 'ribosome')
+
+
+class StreamQuestionsTests(TestCase):
+    def setUp(self):
+        self.user = make_user('stream@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.note = LearningNote.objects.create(user=self.user, title='Cell', content='<p>ribosome</p>')
+
+    def stream(self, questions):
+        with mock.patch('learning_notes_app.learning_note_views.QuestionGenerator') as generator:
+            generator.return_value.stream_questions.side_effect = lambda *args: questions()
+            response = self.client.get(f'/api/learning_notes/{self.note.id}/questions/stream/')
+            return b''.join(response.streaming_content).decode()
+
+    def test_streamed_questions_are_stored(self):
+        events = self.stream(lambda: iter([{"question": "Q1"}, {"question": "Q2"}]))
+
+        self.assertIn('event: done', events)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.generated_questions, [{"question": "Q1"}, {"question": "Q2"}])
+
+    def test_note_edited_during_the_stream_keeps_its_cleared_questions(self):
+        def questions():
+            yield {"question": "Q1"}
+            note = LearningNote.objects.get(id=self.note.id)
+            note.content = '<p>nucleus</p>'
+            note.save()
+
+        self.stream(questions)
+
+        self.note.refresh_from_db()
+        self.assertIsNone(self.note.generated_questions)
+
+
+@mock.patch('learning_notes_app.management.commands.pregenerate_questions.bump_timeline_version')
+class PregenerateQuestionsTests(TestCase):
+    def setUp(self):
+        self.user = make_user('pregenerate@example.com')
+        self.generator = StubQuestionGenerator()
+
+    def pregenerate(self, *args):
+        output = io.StringIO()
+        with mock.patch('learning_notes_app.management.commands.pregenerate_questions.get_question_generator',
+                        return_value=self.generator):
+            call_command('pregenerate_questions', '--rpm', '0', *args, stdout=output, stderr=io.StringIO())
+        return output.getvalue()
+
+    def test_generates_each_distinct_text_once(self, bump_timeline_version):
+        first = LearningNote.objects.create(user=self.user, title='A', content='<p>osmosis</p>')
+        duplicate = LearningNote.objects.create(user=self.user, title='B', content='<p>osmosis</p>')
+        failing = LearningNote.objects.create(user=self.user, title='C', content='<p>fail</p>')
+        done = LearningNote.objects.create(
+            user=self.user, title='D', content='<p>done</p>', generated_questions=[{"question": "?"}])
+
+        output = self.pregenerate('--batch-size', '2')
+
+        self.assertEqual(sorted(self.generator.calls), ['fail', 'osmosis'])
+        for note in (first, duplicate):
+            note.refresh_from_db()
+            self.assertEqual(note.generated_questions[0]['answer'], 'osmosis')
+        failing.refresh_from_db()
+        done.refresh_from_db()
+        self.assertIsNone(failing.generated_questions)
+        self.assertEqual(done.generated_questions, [{"question": "?"}])
+        self.assertIn('3 note(s) processed, 1 LLM call(s), 1 failure(s)', output)
+        bump_timeline_version.assert_called_with(self.user.id)
+
+    def test_note_edited_during_generation_keeps_its_cleared_questions(self, bump_timeline_version):
+        edited = LearningNote.objects.create(user=self.user, title='A', content='<p>osmosis</p>')
+        untouched = LearningNote.objects.create(user=self.user, title='B', content='<p>diffusion</p>')
+        not_backfilled = LearningNote.objects.create(user=self.user, title='C', content='<p>mitosis</p>')
+        LearningNote.objects.filter(id=not_backfilled.id).update(plain_text='')
+
+        def edit_note(*args):
+            note = LearningNote.objects.get(id=edited.id)
+            note.content = '<p>osmotic pressure</p>'
+            note.save()
+
+        with mock.patch('learning_notes_app.management.commands.pregenerate_questions.store_cached_questions',
+                        side_effect=edit_note):
+            self.pregenerate()
+
+        for note in (edited, untouched, not_backfilled):
+            note.refresh_from_db()
+        self.assertIsNone(edited.generated_questions)
+        self.assertEqual(untouched.generated_questions[0]['answer'], 'diffusion')
+        self.assertEqual(not_backfilled.generated_questions[0]['answer'], 'mitosis')
+
+    def test_uses_cached_questions(self, bump_timeline_version):
+        LearningNote.objects.create(user=self.user, title='A', content='<p>osmosis</p>')
+        self.pregenerate()
+        LearningNote.objects.create(user=self.user, title='B', content='<p>osmosis</p>')
+
+        output = self.pregenerate()
+
+        self.assertEqual(self.generator.calls, ['osmosis'])
+        self.assertIn('1 note(s) processed, 0 LLM call(s), 0 failure(s)', output)
+
+
+class LabelDeletionTests(TestCase):
+    def test_deleting_a_label_changes_the_timeline_etag(self):
+        user = make_user('labels@example.com')
+        client = APIClient()
+        client.force_authenticate(user)
+        label = Label.objects.create(name='doomed', color='#ff0000', created_by=user)
+        note = LearningNote.objects.create(user=user, title='Labelled', content='<p>x</p>')
+        note.labels.add(label)
+        other_note = LearningNote.objects.create(user=user, title='Untouched', content='<p>y</p>')
+
+        first = client.get(f'/api/timeline/{user.id}/')
+        etag = first['ETag']
+        self.assertEqual(first.json()['results'][1]['labels'], [label.id])
+
+        response = client.delete(f'/api/labels/delete-label/{label.id}/')
+        self.assertEqual(response.status_code, 200)
+
+        second = client.get(f'/api/timeline/{user.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['results'][1]['labels'], [])
+        self.assertEqual(LearningNote.objects.get(id=other_note.id).updated_at, other_note.updated_at)
+
+
+class TypeaheadSearchTests(TestCase):
+    def setUp(self):
+        self.user = make_user('typeahead@example.com')
+
+    def titles(self, text):
+        return [suggestion['title'] for suggestion in typeahead_search(self.user, text)]
+
+    def test_matches_prefixes_in_title_and_body(self):
+        LearningNote.objects.create(user=self.user, title='Mitochondria', content='<p>organelles</p>')
+        LearningNote.objects.create(user=self.user, title='Cells', content='<p>mitochondrial DNA</p>')
+        LearningNote.objects.create(user=self.user, title='Archived mitochondria', content='x', archived=True)
+
+        self.assertCountEqual(self.titles('mitoch'), ['Mitochondria', 'Cells'])
+
+    def test_tolerates_typos_in_titles_only(self):
+        LearningNote.objects.create(user=self.user, title='Photosynthesis', content='<p>light</p>')
+        LearningNote.objects.create(user=self.user, title='Leaves', content='<p>photosynthesis</p>')
+
+        self.assertEqual(self.titles('photosinthesis'), ['Photosynthesis'])
+
+    @override_settings(TYPEAHEAD_RANK_WINDOW=2)
+    def test_ranks_a_bounded_number_of_matches(self):
+        for i in range(5):
+            LearningNote.objects.create(user=self.user, title=f'Note {i}', content='<p>mitochondria</p>')
+
+        self.assertEqual(len(self.titles('mitoch')), 2)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        user = make_user('pages@example.com')
+        self.notes = LearningNote.objects.bulk_create([
+            LearningNote(user=user, title=f'Note {i}', content='x') for i in range(7)])
+        # Five notes share one created_at, so pages have to break ties on id
+        same_time = timezone.now() - timedelta(hours=1)
+        LearningNote.objects.filter(id__in=[note.id for note in self.notes[1:6]]).update(created_at=same_time)
+        LearningNote.objects.filter(id=self.notes[0].id).update(created_at=same_time - timedelta(hours=1))
+        self.queryset = LearningNote.objects.filter(user=user)
+        # Newest first: the note created last, then the tied notes by descending id, then the oldest
+        self.expected = [self.notes[6].id] + [note.id for note in reversed(self.notes[1:6])] + [self.notes[0].id]
+
+    def paginate(self, **params):
+        paginator = LearningNoteCursorPagination()
+        request = Request(APIRequestFactory().get('/', {'page_size': 2, **params}))
+        rows = paginator.paginate_queryset(self.queryset, request)
+
+        return [row.id for row in rows], paginator.next_cursor, paginator.previous_cursor
+
+    def test_forward_pages_split_equal_created_at_by_id(self):
+        pages = []
+        ids, next_cursor, previous_cursor = self.paginate()
+        self.assertIsNone(previous_cursor)
+        while True:
+            pages.append(ids)
+            if next_cursor is None:
+                break
+            ids, next_cursor, previous_cursor = self.paginate(cursor=next_cursor)
+            self.assertIsNotNone(previous_cursor)
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), self.expected)
+
+    def test_backward_pages_return_the_same_pages(self):
+        forward = []
+        params = {}
+        while True:
+            ids, next_cursor, previous_cursor = self.paginate(**params)
+            forward.append(ids)
+            if next_cursor is None:
+                break
+            params = {'cursor': next_cursor}
+
+        # Walk back from the last page with the previous cursors
+        backward = []
+        while previous_cursor is not None:
+            ids, next_cursor, previous_cursor = self.paginate(cursor=previous_cursor)
+            self.assertIsNotNone(next_cursor)
+            backward.insert(0, ids)
+
+        self.assertEqual(backward, forward[:-1])
+
+
+class SearchLearningNotesTests(TestCase):
+    def setUp(self):
+        self.user = make_user('search@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.biology = Collection.objects.create(name='Biology', created_by=self.user)
+        self.chemistry = Collection.objects.create(name='Chemistry', created_by=self.user)
+        self.exam = Label.objects.create(name='search-exam', color='#fff', created_by=self.user)
+        self.review = Label.objects.create(name='search-review', color='#000', created_by=self.user)
+
+        # A title match outranks body matches; the five identical notes share one rank
+        self.best = LearningNote.objects.create(user=self.user, title='Enzyme', content='catalysis')
+        self.tied = [
+            LearningNote.objects.create(user=self.user, title='Note', content='enzyme') for _ in range(5)]
+        LearningNote.objects.create(user=self.user, title='Note', content='unrelated')
+        LearningNote.objects.create(user=make_user('search-other@example.com'), title='Enzyme', content='x')
+        self.expected = [self.best.id] + [note.id for note in reversed(self.tied)]
+
+    def search(self, **params):
+        response = self.client.get('/api/learning_notes/search_learning_notes/', {'query': 'enzyme', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def search_ids(self, **params):
+        return [result['id'] for result in self.search(**params)['results']]
+
+    def test_pages_split_equal_rank_by_id(self):
+        pages = []
+        data = self.search(page_size=2)
+        while True:
+            pages.append([result['id'] for result in data['results']])
+            if data['next_cursor'] is None:
+                break
+            data = self.search(page_size=2, cursor=data['next_cursor'])
+            self.assertNotIn('facets', data)
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 2])
+        self.assertEqual(sum(pages, []), self.expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/learning_notes/search_learning_notes/', {'query': 'enzyme', 'cursor': 'x'})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_archived_filter(self):
+        LearningNote.objects.filter(id=self.tied[0].id).update(archived=True)
+
+        self.assertEqual(self.search_ids(), [id for id in self.expected if id != self.tied[0].id])
+        self.assertEqual(self.search_ids(archived='true'), [self.tied[0].id])
+        self.assertEqual(self.search_ids(archived='all'), self.expected)
+
+    def test_collection_and_label_filters(self):
+        LearningNote.objects.filter(id__in=[self.best.id, self.tied[0].id]).update(collection=self.biology)
+        self.tied[1].labels.add(self.exam)
+        self.tied[2].labels.add(self.review)
+
+        self.assertEqual(self.search_ids(collection_id=self.biology.id), [self.best.id, self.tied[0].id])
+        self.assertEqual(
+            self.search_ids(labels=json.dumps([self.exam.id, self.review.id])), [self.tied[2].id, self.tied[1].id])
+        self.assertEqual(self.search_ids(collection_id=self.biology.id, labels=json.dumps([self.exam.id])), [])
+
+    def test_each_facet_ignores_its_own_filter(self):
+        LearningNote.objects.filter(id__in=[self.best.id, self.tied[0].id]).update(collection=self.biology)
+        LearningNote.objects.filter(id=self.tied[1].id).update(collection=self.chemistry)
+        self.best.labels.add(self.exam)
+        self.tied[1].labels.add(self.exam, self.review)
+        self.tied[2].labels.add(self.review)
+
+        facets = self.search(collection_id=self.biology.id, labels=json.dumps([self.exam.id]))['facets']
+
+        # Label counts are limited to the biology collection, collection counts to the exam label
+        self.assertEqual(facets['labels'], [{'id': self.exam.id, 'name': 'search-exam', 'count': 1}])
+        self.assertEqual(facets['collections'], [
+            {'id': self.biology.id, 'name': 'Biology', 'count': 1},
+            {'id': self.chemistry.id, 'name': 'Chemistry', 'count': 1},
+        ])
+
+        facets = self.search()['facets']
+        self.assertEqual(facets['labels'], [
+            {'id': self.exam.id, 'name': 'search-exam', 'count': 2},
+            {'id': self.review.id, 'name': 'search-review', 'count': 2},
+        ])
+        self.assertEqual(facets['collections'], [
+            {'id': self.biology.id, 'name': 'Biology', 'count': 2},
+            {'id': self.chemistry.id, 'name': 'Chemistry', 'count': 1},
+        ])
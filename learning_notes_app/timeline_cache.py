@@ -0,0 +1,104 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class TimelineCache:
+    """
+    Caches rendered timeline pages per user.
+
+    Every key embeds the user's current "timeline version". Write paths call
+    `bump_version`, which moves the user onto a fresh set of keys, so stale pages are
+    never read again and simply age out of the backend; nothing has to be purged.
+    """
+    version_key_prefix = 'timeline:version'
+    entry_key_prefix = 'timeline:page'
+
+    def __init__(self, backend=None, timeout=None):
+        self._backend = backend
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        if self._backend is not None:
+            return self._backend
+        return caches[getattr(settings, 'TIMELINE_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return getattr(settings, 'TIMELINE_CACHE_TIMEOUT', 300)
+
+    def _version_key(self, user_id):
+        return f'{self.version_key_prefix}:{user_id}'
+
+    def get_version(self, user_id):
+        key = self._version_key(user_id)
+        version = self.backend.get(key)
+
+        if version is None:
+            # Seed from the clock so a version lost to eviction never falls back to a
+            # value that older cache entries were written under
+            version = time.time_ns()
+            if not self.backend.add(key, version, timeout=None):
+                version = self.backend.get(key, version)
+
+        return version
+
+    def bump_version(self, user_id):
+        key = self._version_key(user_id)
+        try:
+            self.backend.incr(key)
+        except ValueError:
+            self.backend.set(key, time.time_ns(), timeout=None)
+
+    def make_key(self, user_id, params):
+        """
+        Builds the cache key for one timeline page. Read the key before querying the
+        database so a concurrent write can only ever invalidate, never poison, an entry.
+        """
+        version = self.get_version(user_id)
+        digest = hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+        return f'{self.entry_key_prefix}:{user_id}:{version}:{digest}'
+
+    def get(self, key):
+        data = self.backend.get(key)
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return data
+
+    def set(self, key, data):
+        self.backend.set(key, data, timeout=self.timeout)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+        }
+
+
+timeline_cache = TimelineCache()
+
+
+def bump_timeline_version(user_id):
+    timeline_cache.bump_version(user_id)
@@ -1,4 +1,36 @@
-from bs4 import BeautifulSoup
+import base64
+import json
+import threading
+import time
+from html.parser import HTMLParser
+
+class TextExtractor(HTMLParser):
+     """
+     Collects the text of an HTML document as it is parsed, without building a tree.
+     The contents of script, style and template elements are skipped.
+     """
+     skipped_tags = {"script", "style", "template"}
+
+     def __init__(self):
+          super().__init__(convert_charrefs=True)
+          self.parts = []
+          self._skip_depth = 0
+
+     def handle_starttag(self, tag, attrs):
+          if tag in self.skipped_tags:
+               self._skip_depth += 1
+
+     def handle_endtag(self, tag):
+          if tag in self.skipped_tags and self._skip_depth:
+               self._skip_depth -= 1
+
+     def handle_data(self, data):
+          if not self._skip_depth:
+               self.parts.append(data)
+
+     def unknown_decl(self, data):
+          if data.startswith("CDATA[") and not self._skip_depth:
+               self.parts.append(data[len("CDATA["):])
 
 def extract_text_from_html(html_content):
      """
@@ -7,8 +39,102 @@ def extract_text_from_html(html_content):
      :param html_content: A string containing HTML.
      :return: A string of plain text.
      """
-     soup = BeautifulSoup(html_content, "html.parser")
-     text = soup.get_text(separator=" ")
+     extractor = TextExtractor()
+     extractor.feed(html_content)
+     extractor.close()
+
+     text = " ".join(extractor.parts)
      cleaned_text = " ".join(text.split())
 
-     return cleaned_text
\ No newline at end of file
+     return cleaned_text
+
+def make_excerpt(text, max_length=280):
+     """
+     Shortens plain text to at most `max_length` characters for previews, cutting at a word
+     boundary where possible and marking the cut with an ellipsis.
+
+     :param text: Plain text, e.g. from `extract_text_from_html`.
+     :param max_length: Maximum length of the excerpt, ellipsis included.
+     :return: The excerpt.
+     """
+     if len(text) <= max_length:
+          return text
+
+     cut = text[:max_length - 1]
+     last_space = cut.rfind(" ")
+     if last_space > max_length // 2:
+          cut = cut[:last_space]
+
+     return cut.rstrip() + "…"
+
+def encode_cursor(position):
+     """
+     Encodes a pagination cursor position into an opaque, URL-safe token.
+
+     :param position: A JSON-serializable dict describing the position.
+     :return: A base64 token without padding.
+     """
+     payload = json.dumps(position, separators=(",", ":")).encode("utf-8")
+
+     return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+def decode_cursor(token):
+     """
+     Decodes a token produced by `encode_cursor`.
+
+     :param token: The opaque cursor token.
+     :return: The position dict.
+     :raises ValueError: If the token is malformed.
+     """
+     padding = "=" * (-len(token) % 4)
+     try:
+          position = json.loads(base64.urlsafe_b64decode(token + padding))
+     except (TypeError, ValueError, UnicodeDecodeError) as e:
+          raise ValueError("Malformed cursor") from e
+
+     if not isinstance(position, dict):
+          raise ValueError("Malformed cursor")
+
+     return position
+
+def reciprocal_rank_fusion(*rankings, k=60):
+     """
+     Merges several rankings of the same kind of item into one (reciprocal rank fusion).
+     Each item scores the sum of 1 / (k + rank) over the rankings it appears in, so items
+     near the top of several lists win without having to compare their raw scores.
+
+     :param rankings: Sequences of item keys, best first.
+     :param k: Damping constant; larger values flatten the advantage of the top ranks.
+     :return: The item keys ordered by fused score, best first.
+     """
+     scores = {}
+     for ranking in rankings:
+          for rank, item in enumerate(ranking, start=1):
+               scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+
+     return sorted(scores, key=lambda item: -scores[item])
+
+
+class RateLimiter:
+     """
+     Spaces calls evenly so that at most `requests_per_minute` start in any minute,
+     shared by every thread that calls `acquire`.
+     """
+     def __init__(self, requests_per_minute, clock=time.monotonic, sleep=time.sleep):
+          self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+          self._clock = clock
+          self._sleep = sleep
+          self._lock = threading.Lock()
+          self._next_slot = None
+
+     def acquire(self):
+          """
+          Blocks until the caller may start its request.
+          """
+          with self._lock:
+               now = self._clock()
+               slot = now if self._next_slot is None else max(now, self._next_slot)
+               self._next_slot = slot + self.interval
+
+          if slot > now:
+               self._sleep(slot - now)
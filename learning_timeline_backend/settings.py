@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 
     "learning_notes_app.apps.LearningNotesAppConfig",
     "rest_framework",
@@ -52,9 +53,23 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # orjson for JSON, MessagePack for clients sending `Accept: application/msgpack`
+    'DEFAULT_RENDERER_CLASSES': [
+        'learning_notes_app.renderers.ORJSONRenderer',
+        'learning_notes_app.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'learning_notes_app.renderers.ORJSONParser',
+        'learning_notes_app.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+if DEBUG:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('rest_framework.renderers.BrowsableAPIRenderer')
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=2),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -96,6 +111,7 @@ SIMPLE_JWT = {
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "learning_notes_app.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -107,6 +123,12 @@ MIDDLEWARE = [
     "whitenoise.middleware.WhiteNoiseMiddleware",
 ]
 
+# Response compression: gzip always, brotli and zstd when the optional `brotli` and
+# `zstandard` packages are installed
+
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+
 # Allow requests from localhost:3000
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
@@ -175,6 +197,47 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory is per process: point the timeline cache at a shared backend (Redis,
+# Memcached or the database cache) when running more than one gunicorn worker.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+TIMELINE_CACHE_ALIAS = "default"
+TIMELINE_CACHE_TIMEOUT = 300
+
+
+# Question generation jobs, processed by `python manage.py process_question_jobs`
+
+QUESTION_JOB_MAX_ATTEMPTS = 3
+QUESTION_JOB_LEASE_SECONDS = 300
+
+
+# Collection archival: notes are updated in primary-key batches. Collections with up to
+# COLLECTION_ARCHIVE_INLINE_LIMIT notes to change are handled within the request, larger ones
+# by `python manage.py process_collection_archive_jobs`
+
+COLLECTION_ARCHIVE_BATCH_SIZE = 500
+COLLECTION_ARCHIVE_INLINE_LIMIT = 1000
+COLLECTION_ARCHIVE_MAX_ATTEMPTS = 3
+COLLECTION_ARCHIVE_LEASE_SECONDS = 300
+
+
+# Search typeahead: candidates taken from each of the full-text and trigram rankings before
+# they are fused, and how many index matches each ranking looks at. Matches past the window
+# are never ranked, so a larger window finds the best match more often and costs latency.
+# The target is p95 under 50 ms at 100k notes; see benchmarks/bench_typeahead.py for the
+# last measurement.
+
+TYPEAHEAD_CANDIDATES = 50
+TYPEAHEAD_RANK_WINDOW = 200
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
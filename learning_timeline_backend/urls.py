@@ -30,6 +30,8 @@ urlpatterns = [
 
     path("api/timeline/<int:user_id>/",
          learning_note_views.fetch_timeline, name='timeline'),
+    path("api/timeline/cache-stats/",
+         learning_note_views.timeline_cache_stats, name='timeline-cache-stats'),
     path("api/learning_notes/create/<int:userId>/",
          learning_note_views.add_learning_note, name='add-learning-note'),
     path("api/learning_notes/update/<int:pk>/",
@@ -44,10 +46,22 @@ urlpatterns = [
          learning_note_views.remove_label_from_learning_note, name='remove-label-from-learning-note'),
     path('api/learning_notes/<int:note_id>/add_to_collection/',
          learning_note_views.add_note_to_collection, name='add-note-to-collection'),
+    path('api/learning_notes/export/',
+         learning_note_views.export_learning_notes, name='export-learning-notes'),
+    path('api/learning_notes/import/',
+         learning_note_views.import_learning_notes, name='import-learning-notes'),
+    path('api/learning_notes/bulk/',
+         learning_note_views.bulk_learning_note_operations, name='bulk-learning-note-operations'),
     path('api/learning_notes/search_learning_notes/',
          learning_note_views.search_learning_notes, name='search-learning-notes'),
+    path('api/learning_notes/search/typeahead/',
+         learning_note_views.typeahead_learning_notes, name='typeahead-learning-notes'),
     path('api/learning_notes/generate_questions/',
          learning_note_views.generate_questions, name='generate-questions-for-note'),
+    path('api/learning_notes/generate_questions/jobs/<int:job_id>/',
+         learning_note_views.question_job_status, name='question-job-status'),
+    path('api/learning_notes/<int:note_id>/questions/stream/',
+         learning_note_views.stream_questions, name='stream-questions'),
     path('api/collection/<int:collection_id>/',
          learning_note_views.get_notes_by_collection, name='get-notes-by-collection'),
 
@@ -62,4 +76,8 @@ urlpatterns = [
          collection_views.create_collection, name='create-collection'),
     path('api/collection/<int:collection_id>/archive/',
          collection_views.archive_collection, name='archive-collection'),
+    path('api/collection/<int:collection_id>/unarchive/',
+         collection_views.unarchive_collection, name='unarchive-collection'),
+    path('api/collection/archive-jobs/<int:job_id>/',
+         collection_views.collection_archive_job_status, name='collection-archive-job-status'),
 ]